@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+"""Measure how the background loops of both cogs scale with the number of guilds.
+
+Each cog is loaded against a fake bot, an in-memory Config driver and a local
+aiohttp server standing in for Broadcast Box and the FFF feed. Every guild is
+then made due and single ticks of `background_check_for_update` are run,
+reporting wall time, Discord calls, Config reads and writes, and peak memory.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_loops
+    python -m benchmarks.bench_loops --guilds 10 1000 --channels 2 --latency 0.05
+"""
+import sys
+import copy
+import time
+import pickle
+import asyncio
+import logging
+import importlib
+import argparse
+import tempfile
+import tracemalloc
+import collections
+
+from aiohttp import web
+from typing import Any, Counter, Dict, List, Optional
+
+from redbot.core import config as red_config, data_manager
+from redbot.core._drivers.base import BaseDriver, ConfigCategory, IdentifierData
+
+import broadcastboxlive.broadcastboxlive as bbl_module
+import factoriocogfriday.factoriocogfriday as fcf_module
+
+HOST = "127.0.0.1"
+PORT = 8799
+BASE_URL = f"http://{HOST}:{PORT}"
+
+FFF_NUM = 400
+
+# Counters shared by the fakes, reset before every measured tick
+discord_calls: Counter[str] = collections.Counter()
+config_calls: Counter[str] = collections.Counter()
+
+
+class ErrorCollector(logging.Handler):
+    """Keep the errors the cogs log, a run that logs any isn't a valid measurement."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord):
+        self.messages.append(record.getMessage())
+
+
+errors = ErrorCollector()
+
+
+class MemoryDriver(BaseDriver):
+    """A Config driver keeping everything in one dict and counting every access."""
+
+    data: Dict[str, Any] = {}
+
+    @classmethod
+    async def initialize(cls, **storage_details) -> None:
+        pass
+
+    @classmethod
+    async def teardown(cls) -> None:
+        pass
+
+    @staticmethod
+    def get_config_details() -> Dict[str, Any]:
+        return {}
+
+    @classmethod
+    async def aiter_cogs(cls):
+        for uuid in cls.data:
+            yield "Benchmark", uuid
+
+    @classmethod
+    def seed(cls, uuid: str, category: str, values: Dict[str, Any]):
+        cls.data.setdefault(uuid, {})[category] = values
+
+    async def get(self, identifier_data: IdentifierData):
+        config_calls["read"] += 1
+        partial = self.data
+        for key in identifier_data.to_tuple()[1:]:
+            partial = partial[key]
+        # Copied like the JSON driver does, callers may mutate what they get
+        return pickle.loads(pickle.dumps(partial, -1))
+
+    async def set(self, identifier_data: IdentifierData, value=None):
+        config_calls["write"] += 1
+        keys = identifier_data.to_tuple()[1:]
+        partial = self.data
+        for key in keys[:-1]:
+            partial = partial.setdefault(key, {})
+        partial[keys[-1]] = value
+
+    async def clear(self, identifier_data: IdentifierData):
+        config_calls["write"] += 1
+        keys = identifier_data.to_tuple()[1:]
+        partial = self.data
+        try:
+            for key in keys[:-1]:
+                partial = partial[key]
+            del partial[keys[-1]]
+        except KeyError:
+            pass
+
+
+class FakeUser:
+    id = 1
+    display_name = "Benchmark"
+
+    class display_avatar:
+        url = "https://example.com/avatar.png"
+
+
+class FakeMessage:
+    def __init__(self, channel: "FakeChannel", content: Optional[str], embed: Any):
+        self.id = channel.bot.next_id()
+        self.channel = channel
+        self.author = channel.bot.user
+        self.content = content
+        self.embeds = [embed] if embed is not None else []
+
+    async def edit(self, embed: Any = None, **kwargs):
+        await self.channel.bot.call("edit")
+        self.embeds = [embed]
+        return self
+
+
+class FakePartialMessage:
+    def __init__(self, channel: "FakeChannel", message_id: int):
+        self.channel = channel
+        self.id = message_id
+
+    async def edit(self, embed: Any = None, **kwargs):
+        await self.channel.bot.call("edit")
+        message = self.channel.messages[self.id]
+        message.embeds = [embed]
+        return message
+
+    async def delete(self):
+        await self.channel.bot.call("delete")
+        self.channel.messages.pop(self.id, None)
+
+
+class FakeChannel:
+    def __init__(self, bot: "FakeBot", channel_id: int, guild: "FakeGuild"):
+        self.bot = bot
+        self.id = channel_id
+        self.guild = guild
+        self.mention = f"<#{channel_id}>"
+        self.messages: Dict[int, FakeMessage] = {}
+
+    async def send(self, content: Optional[str] = None, embed: Any = None, **kwargs):
+        await self.bot.call("send")
+        message = FakeMessage(self, content, embed)
+        self.messages[message.id] = message
+        return message
+
+    def get_partial_message(self, message_id: int) -> FakePartialMessage:
+        return FakePartialMessage(self, message_id)
+
+    async def history(self, limit: int = 100):
+        await self.bot.call("history")
+        for message in list(self.messages.values())[::-1][:limit]:
+            yield message
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.name = f"guild-{guild_id}"
+
+
+class FakeBot:
+    """Just enough of a Red bot for the cogs' background loops."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.user = FakeUser()
+        self.guild_map: Dict[int, FakeGuild] = {}
+        self.channel_map: Dict[int, FakeChannel] = {}
+        self._ids = iter(range(10**12, 10**13))
+
+    @property
+    def guilds(self) -> List[FakeGuild]:
+        return list(self.guild_map.values())
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    async def call(self, route: str):
+        discord_calls[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def get_guild(self, guild_id: int) -> Optional[FakeGuild]:
+        return self.guild_map.get(guild_id)
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self.channel_map.get(channel_id)
+
+    async def wait_until_red_ready(self):
+        pass
+
+    def populate(self, guilds: int, channels: int) -> Dict[int, List[int]]:
+        """Create `guilds` guilds with `channels` channels each."""
+        layout = {}
+        for guild_id in range(1, guilds + 1):
+            guild = FakeGuild(guild_id)
+            self.guild_map[guild_id] = guild
+            layout[guild_id] = []
+            for offset in range(channels):
+                channel = FakeChannel(self, guild_id * 1000 + offset, guild)
+                self.channel_map[channel.id] = channel
+                layout[guild_id].append(channel.id)
+        return layout
+
+
+class Upstream:
+    """Local stand-in for `/api/status` and the FFF feed."""
+
+    def __init__(self):
+        self.streams: List[Dict[str, Any]] = [
+            {"streamKey": "Bearer alpha", "videoStreams": [{}], "whepSessions": []},
+        ]
+        self.fff_num = FFF_NUM
+        self.hits: Counter[str] = collections.Counter()
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _status(self, request: web.Request) -> web.Response:
+        self.hits["status"] += 1
+        return web.json_response(self.streams)
+
+    async def _rss(self, request: web.Request) -> web.Response:
+        self.hits["rss"] += 1
+        entries = "".join(
+            f"<entry><id>https://www.factorio.com/blog/post/fff-{number}</id></entry>"
+            for number in range(self.fff_num, self.fff_num - 20, -1)
+        )
+        return web.Response(text=f"<feed>{entries}</feed>", content_type="application/atom+xml")
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/api/status", self._status)
+        app.router.add_get("/blog/rss", self._rss)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, HOST, PORT).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+def reset():
+    """Start a run from an empty store and freshly imported cogs.
+
+    The driver writes into the nested dicts it was seeded with, so nothing one run
+    leaves behind, in the store or in a module constant, may reach the next one.
+    """
+    global bbl_module, fcf_module
+    MemoryDriver.data.clear()
+    bbl_module = importlib.reload(bbl_module)
+    fcf_module = importlib.reload(fcf_module)
+    fcf_module.FFF_RSS = f"{BASE_URL}/blog/rss"
+    errors.messages.clear()
+
+
+def seed_guild(defaults: Dict[str, Any], **values) -> Dict[str, Any]:
+    """A copy of `defaults` sharing none of its nested values with it or other guilds."""
+    guild = copy.deepcopy(defaults)
+    guild.update(values)
+    return guild
+
+
+def seed_bbl(layout: Dict[int, List[int]]):
+    uuid = str(bbl_module.UNIQUE_ID)
+    MemoryDriver.seed(
+        uuid,
+        ConfigCategory.GUILD.value,
+        {
+            str(guild_id): seed_guild(
+                bbl_module.DEFAULT_GUILD,
+                url=f"{BASE_URL}/api/status",
+                interval=0,
+                channels=channels,
+            )
+            for guild_id, channels in layout.items()
+        },
+    )
+
+
+def seed_fcf(layout: Dict[int, List[int]]):
+    uuid = str(fcf_module.UNIQUE_ID)
+    MemoryDriver.seed(
+        uuid,
+        ConfigCategory.GUILD.value,
+        {
+            str(guild_id): seed_guild(
+                fcf_module.DEFAULT_GUILD,
+                channels=channels,
+                fff_info={str(channel): FFF_NUM - 1 for channel in channels},
+                interval=0,
+            )
+            for guild_id, channels in layout.items()
+        },
+    )
+    MemoryDriver.seed(uuid, ConfigCategory.GLOBAL.value, {"timeout": 0})
+
+
+async def load(cog_cls, bot: FakeBot):
+    cog = cog_cls(bot)
+    await cog.cog_load()
+    # Ticks are driven by hand
+    cog.background_check_for_update.cancel()
+    return cog
+
+
+async def tick(cog, bot: FakeBot, memory: bool) -> Dict[str, Any]:
+    """Make every guild due and run one iteration of the background loop."""
+    for guild_id in bot.guild_map:
+        cog.scheduler.schedule(guild_id, 0)
+    discord_calls.clear()
+    config_calls.clear()
+
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await cog.background_check_for_update()
+    elapsed = time.perf_counter() - started
+    peak = 0
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "wall": elapsed,
+        "discord": dict(discord_calls),
+        "reads": config_calls["read"],
+        "writes": config_calls["write"],
+        "peak": peak,
+    }
+
+
+async def bbl_ticks(cog, upstream: Upstream, bot: FakeBot, memory: bool):
+    results = [("first", await tick(cog, bot, memory))]
+    results.append(("unchanged", await tick(cog, bot, memory)))
+    upstream.streams.append({"streamKey": "Bearer beta", "videoStreams": [{}]})
+    results.append(("stream started", await tick(cog, bot, memory)))
+    return results
+
+
+async def fcf_ticks(cog, upstream: Upstream, bot: FakeBot, memory: bool):
+    results = [("new fff", await tick(cog, bot, memory))]
+    results.append(("unchanged", await tick(cog, bot, memory)))
+    return results
+
+
+async def run(name: str, guilds: int, channels: int, latency: float, memory: bool):
+    reset()
+    bot = FakeBot(latency)
+    layout = bot.populate(guilds, channels)
+    upstream = Upstream()
+    await upstream.start()
+    try:
+        if name == "bbl":
+            seed_bbl(layout)
+            cog = await load(bbl_module.BroadcastBoxLive, bot)
+            results = await bbl_ticks(cog, upstream, bot, memory)
+        else:
+            seed_fcf(layout)
+            cog = await load(fcf_module.FactorioCogFriday, bot)
+            results = await fcf_ticks(cog, upstream, bot, memory)
+        await cog.cog_unload()
+    finally:
+        await upstream.stop()
+    if errors.messages:
+        raise RuntimeError(
+            f"{name} logged {len(errors.messages)} errors with {guilds} guilds, "
+            f"first: {errors.messages[0]}"
+        )
+    return results, dict(upstream.hits)
+
+
+def report(name: str, guilds: int, timed: list, traced: list, hits: Dict[str, int]):
+    print(f"\n{name} - {guilds} guilds, upstream requests: {hits}")
+    print(f"  {'tick':<16}{'wall ms':>10}{'reads':>8}{'writes':>8}{'peak KiB':>10}  discord")
+    for (label, result), (_label, traced_result) in zip(timed, traced or timed):
+        peak = f"{traced_result['peak'] / 1024:.0f}" if traced else "-"
+        calls = ", ".join(f"{route}={count}" for route, count in sorted(result["discord"].items()))
+        print(
+            f"  {label:<16}{result['wall'] * 1000:>10.1f}{result['reads']:>8}"
+            f"{result['writes']:>8}{peak:>10}  {calls or '-'}"
+        )
+
+
+async def main(args: argparse.Namespace):
+    red_config.get_driver = lambda cog_name, uuid, **kwargs: MemoryDriver(cog_name, uuid)
+    # Files the cogs keep outside of Config go to a throwaway data directory
+    data_manager.basic_config = {
+        "DATA_PATH": tempfile.mkdtemp(prefix="cccogs-bench-"),
+        "COG_PATH_APPEND": "cogs",
+        "CORE_PATH_APPEND": "core",
+        "STORAGE_TYPE": "JSON",
+        "STORAGE_DETAILS": {},
+    }
+    logging.getLogger("red.redbotcogs").addHandler(errors)
+
+    for name in args.cogs:
+        for guilds in args.guilds:
+            # Timings come from a run without tracemalloc, which slows allocations down
+            timed, hits = await run(name, guilds, args.channels, args.latency, memory=False)
+            traced = []
+            if not args.no_memory:
+                traced, _hits = await run(name, guilds, args.channels, args.latency, memory=True)
+            report(name, guilds, timed, traced, hits)
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cogs", nargs="+", choices=("bbl", "fcf"), default=["bbl", "fcf"])
+    parser.add_argument("--guilds", nargs="+", type=int, default=[10, 1000, 10000])
+    parser.add_argument("--channels", type=int, default=1, help="subscribed channels per guild")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds every Discord call takes"
+    )
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args(sys.argv[1:])))
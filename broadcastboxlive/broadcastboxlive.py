@@ -1,15 +1,35 @@
 # -*- coding: utf-8 -*-
+import copy
 import time
+import sqlite3
+import secrets
+import asyncio
 import aiohttp
 import discord
 import logging
 
 # Remove Union when minimum python version is > 3.10
+from pathlib import Path
 from discord.ext import tasks
-from typing import Union, Optional, Dict, Any
+from typing import Union, Optional, Dict, Any, List, Set, Tuple, Callable, Awaitable
+from urllib.parse import urlparse
 from redbot.core import Config, commands, checks
 from redbot.core.i18n import Translator, cog_i18n
-from redbot.core.utils.chat_formatting import success, error, info
+from redbot.core.utils.chat_formatting import success, error, info, box, inline, pagify
+
+from .backoff import PollController, parse_retry_after
+from .coordination import SharedCache
+from .metrics import Metrics, MetricsServer
+from .models import (
+    AggregateStatus,
+    ServerStatus,
+    Stream,
+    StatusDiff,
+    parse_streams,
+    diff_streams,
+)
+from .push import PushServer
+from .scheduler import GuildScheduler
 
 __all__ = ["UNIQUE_ID", "BroadcastBoxLive"]
 
@@ -21,6 +41,56 @@ UNIQUE_ID = 0x1549B7C6E4C7575
 BB_URL = "https://b.siobud.com/api/status"
 EMBED_TITLE = "Live on Broadcast Box Now"
 
+DEFAULT_GUILD = {
+    "channels": [],
+    "interval": 60,
+    "url": BB_URL,
+    # server name -> status URL, empty to only follow `url`
+    "servers": {},
+    "messages": {},
+    "uptime_refresh": 10,
+    "delivery": "bot",
+    "webhooks": {},
+    # channel ID -> {"role": role ID to mention or None, "ended": announce ended streams}
+    "notify": {},
+}
+WEBHOOK_NAME = "Broadcast Box Live"
+
+# Connection pool shared by every request the cog makes
+POOL_LIMIT = 100
+POOL_LIMIT_PER_HOST = 10
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 30
+
+# How old a cached status may be when answering `[p]bbl status`
+STATUS_MAX_AGE = 20
+
+# Servers a guild can follow at once, and how long their names may be
+MAX_SERVERS = 10
+MAX_SERVER_NAME = 32
+
+# Upper bound for the number of channels updated at the same time
+MAX_PARALLELISM = 50
+
+# Servers that push their status are only polled this often to catch missed pushes
+PUSH_RECONCILE_INTERVAL = 600
+
+# How long the process polling a server for every bot on the host keeps the job
+# without renewing it, after that another process takes over
+LEASE_TTL = 120
+
+# A tick gets the smallest interval of its guilds, but at least this many seconds,
+# channels it couldn't update by then are retried this many seconds later
+MIN_TICK_DEADLINE = 10
+CARRY_OVER_DELAY = 5
+# Share of the deadline the status requests may take, a hanging server mustn't
+# leave no time to update the channels following the healthy ones
+FETCH_DEADLINE_SHARE = 0.5
+
+# How often the event loop is checked, and how late it may be before warning
+LAG_CHECK_INTERVAL = 1
+LAG_WARNING = 0.5
+
 
 @cog_i18n(_)
 class BroadcastBoxLive(commands.Cog):
@@ -32,7 +102,7 @@ class BroadcastBoxLive(commands.Cog):
         if ctx.author.bot:
             return
 
-        async with ctx.trigger_typing():
+        async with ctx.typing():
             async with self.conf.guild(ctx.guild).channels() as channels:
                 try:
                     target_channel = ctx.channel if channel is None else channel
@@ -57,7 +127,7 @@ class BroadcastBoxLive(commands.Cog):
                         )
                     else:
                         try:
-                            await self._publish_update(ctx.guild, target_channel.id)
+                            await self._publish_update(ctx.guild, target_channel.id, force=True)
                         except discord.errors.Forbidden:
                             await ctx.send(
                                 error(
@@ -69,6 +139,13 @@ class BroadcastBoxLive(commands.Cog):
                             return
                         else:
                             channels.append(target_channel.id)
+                            self._cache_guild_setting(ctx.guild.id, "channels", list(channels))
+                            if ctx.guild.id not in self.scheduler:
+                                self.scheduler.schedule(
+                                    ctx.guild.id,
+                                    self._guild_settings(ctx.guild.id)["interval"],
+                                    jitter=True,
+                                )
                             await ctx.send(
                                 success(
                                     _(
@@ -81,6 +158,11 @@ class BroadcastBoxLive(commands.Cog):
                 elif action == "remove":
                     if target_channel.id in channels:
                         channels.remove(target_channel.id)
+                        self._cache_guild_setting(ctx.guild.id, "channels", list(channels))
+                        await self._set_notify(ctx.guild, target_channel.id, None)
+                        if not channels:
+                            self.scheduler.remove(ctx.guild.id)
+                        await self._remember_messages(ctx.guild, target_channel.id, [])
                         await ctx.send(
                             success(
                                 _(
@@ -97,116 +179,929 @@ class BroadcastBoxLive(commands.Cog):
                             )
                         )
 
-    async def _get_current_status(self, guild: int, url: str) -> Union[int, None]:
-        if guild is None:
+    def _guild_settings(self, guild_id: int) -> Dict[str, Any]:
+        """Cached settings of a guild, falling back to the registered defaults."""
+        return self.settings.get(guild_id, DEFAULT_GUILD)
+
+    def _guild_servers(self, guild_id: int) -> Dict[str, str]:
+        """The servers a guild follows, by name. A guild that never named any follows its `url`."""
+        settings = self._guild_settings(guild_id)
+        return settings["servers"] or {self._server_name(settings["url"]): settings["url"]}
+
+    @staticmethod
+    def _server_name(url: str) -> str:
+        return urlparse(url).netloc or url
+
+    def _cache_guild_setting(self, guild_id: int, key: str, value: Any):
+        # Copying the defaults only for a guild seen for the first time keeps this cheap
+        if guild_id not in self.settings:
+            self.settings[guild_id] = copy.deepcopy(DEFAULT_GUILD)
+        self.settings[guild_id][key] = value
+
+    async def _set_guild_setting(self, guild: discord.Guild, key: str, value: Any):
+        """Write a guild setting through to Config and the in-memory cache.
+
+        The cache is updated first, so a caller copying the setting while
+        this write is in flight already sees the new value.
+        """
+        self._cache_guild_setting(guild.id, key, value)
+        await self.conf.guild(guild).set_raw(key, value=value)
+
+    async def _set_guild_entry(self, guild: discord.Guild, key: str, entry: str, value: Any):
+        """Write a single entry of a dict guild setting, `None` removes it.
+
+        Concurrent writes to different entries of the same setting can't
+        overwrite each other.
+        """
+        entries = dict(self._guild_settings(guild.id)[key])
+        if value is None:
+            entries.pop(entry, None)
+        else:
+            entries[entry] = value
+        self._cache_guild_setting(guild.id, key, entries)
+        if value is None:
+            await self.conf.guild(guild).clear_raw(key, entry)
+        else:
+            await self.conf.guild(guild).set_raw(key, entry, value=value)
+
+    async def _get_current_status(self, url: str, interval: int) -> Union[int, None]:
+        if url in self.pushed:
+            interval = max(interval, PUSH_RECONCILE_INTERVAL)
+        status = self.url_bb_status.get(url)
+        if status is not None and time.time() - status.last_checked < interval:
+            self.metrics.inc("status_cache", result="hit")
             return None
 
-        url_bb_status = await self.conf.url_bb_status()
-        last_checked = url_bb_status.get(url, {}).get("last_checked", 0)
-        interval = await self.conf.guild(guild).interval()
+        self.metrics.inc("status_cache", result="miss")
+        return await self._single_flight(url, lambda: self._fetch_status(url))
+
+    async def _single_flight(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `factory` once for all concurrent callers using the same `key`."""
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self.inflight[key] = task
+            task.add_done_callback(lambda _task: self.inflight.pop(key, None))
+        else:
+            self.metrics.inc("shared_requests")
+        # A cancelled caller mustn't cancel the request the others are waiting on
+        return await asyncio.shield(task)
+
+    async def _fetch_status(self, url: str) -> Union[int, None]:
+        """Poll `url`, or take the status another bot process on the host polled.
+
+        Without coordination every process polls on its own.
+        """
+        if self.coordinator is None:
+            return await self._poll_status(url)
 
-        if time.time() - last_checked < interval:
+        try:
+            leader = await self.coordinator.acquire(url, LEASE_TTL)
+        except sqlite3.Error as e:
+            log.warning(f"Coordination unavailable, polling {url} directly. Exception: {e!r}")
+            return await self._poll_status(url)
+
+        if leader:
+            resp_status = await self._poll_status(url)
+            status = self.url_bb_status.get(url)
+            if resp_status == 200 and status is not None:
+                try:
+                    await self.coordinator.publish(url, status.to_dict())
+                except sqlite3.Error as e:
+                    log.warning(f"Couldn't share the status of {url}. Exception: {e!r}")
+            return resp_status
+
+        try:
+            shared = await self.coordinator.read(url)
+        except sqlite3.Error as e:
+            log.warning(f"Couldn't read the shared status of {url}. Exception: {e!r}")
+            return None
+        if shared is None:
             return None
 
-        async with aiohttp.ClientSession() as client:
-            try:
-                async with client.get(url) as resp:
-                    resp_status = resp.status
-                    if resp_status == 200:
-                        data = await resp.json()
-                        url_bb_status[url] = {
-                            "data": data,
-                            "resp_status": resp_status,
-                            "last_checked": int(time.time()),
-                        }
-                        await self.conf.url_bb_status.set(url_bb_status)
-                    else:
-                        log.error(f"Error getting json. Status code: {resp_status}")
-                    return resp_status
-            except aiohttp.ClientError as e:
-                log.error(f"Error fetching URL: {url}. Exception: {e}")
-                return None
+        self.metrics.inc("shared_statuses")
+        data = shared[0]
+        current = self.url_bb_status.get(url)
+        if current is None or data["last_checked"] > current.last_checked:
+            await self._ingest_status(ServerStatus.from_dict(url, data))
+        return data["resp_status"]
 
-    async def _format_embed(
-        self, url: str, data: Dict[str, Any], conn_quality: int
-    ) -> discord.Embed:
-        server = "Official" if url == BB_URL else "Custom"
+    async def _poll_status(self, url: str) -> Union[int, None]:
+        controller = self.poll_controllers.setdefault(url, PollController())
+        if not controller.allowed():
+            log.debug(f"Backing off {url} for another {controller.retry_in():.0f} seconds.")
+            self.metrics.inc("fetches", result="backoff")
+            return None
 
-        connection_status = "✅" if conn_quality == 200 else f"{conn_quality} ‼️"
-        connection_color = 0x00FF00 if conn_quality == 200 else 0xFF0000
+        started = time.perf_counter()
+        try:
+            async with self.session.get(url, timeout=self.client_timeout) as resp:
+                resp_status = resp.status
+                if resp_status == 200:
+                    previous = self.url_bb_status.get(url)
+                    streams = parse_streams(await resp.json(), previous and previous.streams)
+                    status = ServerStatus(url, streams, resp_status, int(time.time()))
+                    controller.record_success()
+                elif resp_status in (429, 503):
+                    retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                    controller.record_failure(retry_after)
+                    log.warning(
+                        f"{url} asked us to slow down ({resp_status}),"
+                        f" retrying in {controller.retry_in():.0f} seconds."
+                    )
+                else:
+                    controller.record_failure()
+                    log.error(f"Error getting json. Status code: {resp_status}")
 
-        embed = discord.Embed(title=EMBED_TITLE, color=connection_color)
-        embed.description = f"Connection: {connection_status}\nServer: {server}"
+                self.metrics.inc("fetches", result=resp_status)
+                if resp_status != 200:
+                    self.metrics.inc("fetch_failures", url=url)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            controller.record_failure()
+            self.metrics.inc("fetches", result="error")
+            self.metrics.inc("fetch_failures", url=url)
+            if controller.is_open:
+                log.error(
+                    f"Error fetching URL: {url}. Exception: {e!r}."
+                    f" Pausing requests for {controller.retry_in():.0f} seconds."
+                )
+            else:
+                log.error(f"Error fetching URL: {url}. Exception: {e!r}")
+            return None
+        finally:
+            self.metrics.observe("fetch_seconds", time.perf_counter() - started)
+
+        if resp_status == 200:
+            await self._ingest_status(status)
+        return resp_status
 
-        streams = 0
-        for stream in data:
-            audio_packets_received = stream.get("audioPacketsReceived", 0)
-            video_streams = stream.get("videoStreams", [])
+    async def _ingest_status(self, status: ServerStatus) -> bool:
+        """Store a fresh status and announce its stream transitions.
+
+        Returns whether the status looks different from the previous one.
+        """
+        previous = self.url_bb_status.get(status.url)
+        diff = self._update_status(status)
+        # Without an earlier snapshot every stream would look like it just started
+        if previous is not None and (diff.started or diff.ended):
+            await self._notify(status, diff)
+        return previous is None or previous.digest != status.digest
+
+    def _follows(self, url: str) -> bool:
+        return any(
+            settings["channels"] and url in self._guild_servers(guild_id).values()
+            for guild_id, settings in self.settings.items()
+        )
+
+    async def _on_push_status(self, url: str, payload: List[Dict[str, Any]]) -> bool:
+        if not self._follows(url):
+            return False
+
+        previous = self.url_bb_status.get(url)
+        streams = parse_streams(payload, previous and previous.streams)
+        await self._push(ServerStatus(url, streams, 200, int(time.time())))
+        return True
+
+    async def _on_push_event(self, url: str, key: str, live: bool) -> bool:
+        if not self._follows(url):
+            return False
+
+        previous = self.url_bb_status.get(url)
+        streams = dict(previous.streams) if previous else {}
+        if live:
+            streams.setdefault(key, Stream(key, 0, int(time.time())))
+        else:
+            streams.pop(key, None)
+        await self._push(ServerStatus(url, streams, 200, int(time.time())))
+        return True
+
+    async def _push(self, status: ServerStatus):
+        """Feed a pushed status through the same pipeline as a polled one.
+
+        Guilds following the server are made due right away instead of on
+        their next turn. The background loop updates their embeds, so the
+        push doesn't wait on Discord and a channel is never published to
+        by two updates at once.
+        """
+        self.pushed.add(status.url)
+        if await self._ingest_status(status):
+            for guild_id, settings in self.settings.items():
+                if settings["channels"] and status.url in self._guild_servers(guild_id).values():
+                    self.scheduler.schedule(guild_id, 0)
+        await self._flush_status()
+
+    async def _start_push_server(self):
+        """(Re)start the push server on the configured port, if there is one."""
+        await self._stop_push_server()
+        port = await self.conf.push_port()
+        if port is None:
+            return
 
-            # Filter out non streamers
-            if audio_packets_received == 0 and not video_streams:
+        token = await self.conf.push_token()
+        if token is None:
+            token = secrets.token_urlsafe(32)
+            await self.conf.push_token.set(token)
+
+        server = PushServer(token, self._on_push_status, self._on_push_event)
+        await server.start(await self.conf.push_host(), port)
+        self.push_server = server
+
+    async def _stop_push_server(self):
+        if self.push_server is not None:
+            await self.push_server.stop()
+            self.push_server = None
+
+    def _update_status(self, status: ServerStatus) -> StatusDiff:
+        """Replace the known status of a server and diff it against the previous one."""
+        previous = self.url_bb_status.get(status.url)
+        self.url_bb_status[status.url] = status
+        diff = diff_streams(previous.streams if previous else {}, status.streams)
+        self.status_diffs[status.url] = diff
+
+        # last_checked alone isn't worth a write, it's persisted with the next change
+        if previous is None or previous.resp_status != status.resp_status or diff:
+            self.status_dirty = True
+        return diff
+
+    async def _flush_status(self):
+        """Persist `url_bb_status` and the rendered digests if they changed since the last flush.
+
+        Both are restored on load, so after a restart messages that already
+        show the current status aren't edited again. The digests are written
+        as one map, however many channels changed.
+        """
+        if self.status_dirty:
+            self.status_dirty = False
+            await self.conf.url_bb_status.set(
+                {url: status.to_dict() for url, status in self.url_bb_status.items()}
+            )
+        if self.digests_dirty:
+            self.digests_dirty = False
+            await self.conf.digests.set(
+                {
+                    str(channel): [list(page) for page in rendered]
+                    for channel, rendered in self.digests.items()
+                }
+            )
+
+    async def _dispatch_updates(
+        self, jobs: List[Tuple[discord.Guild, int]], timeout: Optional[float] = None
+    ) -> List[Tuple[discord.Guild, int]]:
+        """Publish to every `(guild, channel)` pair with bounded concurrency.
+
+        Each channel is a single job, so requests to the same channel stay
+        sequential and discord.py's per-route buckets are never contended by
+        this cog, while different channels are updated in parallel.
+
+        Jobs still running after `timeout` seconds are cancelled and returned.
+        """
+        if not jobs:
+            return []
+
+        semaphore = asyncio.Semaphore(self.parallelism)
+
+        async def publish(guild: discord.Guild, channel: int):
+            async with semaphore:
+                await self._publish_update(guild, channel)
+
+        tasks = [asyncio.ensure_future(publish(guild, channel)) for guild, channel in jobs]
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        # Let the cancelled jobs unwind before their channels are touched again
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        unfinished = []
+        for (guild, channel), task in zip(jobs, tasks):
+            if task in pending:
+                unfinished.append((guild, channel))
+            elif task.exception() is not None:
+                self.metrics.inc("publish_errors")
+                log.error(
+                    f"Error publishing update to channel {channel} in guild {guild.name}:"
+                    f" {task.exception()!r}"
+                )
+        return unfinished
+
+    async def _fetch_due(self, subscribers: Dict[str, Dict[str, Any]], timeout: float):
+        """Fetch every subscribed status URL concurrently, giving up after `timeout`.
+
+        Requests still running keep going in the background, whatever they
+        return is cached for the next tick.
+        """
+        fetches = [
+            self._get_current_status(url, group["interval"]) for url, group in subscribers.items()
+        ]
+        if not fetches:
+            return
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*fetches), timeout)
+        except asyncio.TimeoutError:
+            self.metrics.inc("fetch_timeouts")
+            log.warning(f"Status requests didn't finish within {timeout:g} seconds.")
+
+    async def _notify(self, status: ServerStatus, diff: StatusDiff):
+        """Post one message per started, and optionally ended, stream to channels in
+        notification mode that follow `status.url`.
+        """
+        jobs = []
+        for guild_id, settings in self.settings.items():
+            if not settings["notify"]:
+                continue
+            server = next(
+                (name for name, url in self._guild_servers(guild_id).items() if url == status.url),
+                None,
+            )
+            guild = self.bot.get_guild(guild_id)
+            if server is None or guild is None:
                 continue
 
-            stream_key = stream["streamKey"].replace("Bearer ", "")
-            sessions = len(stream.get("whepSessions", []))
-            first_seen = stream.get("firstSeenEpoch", time.time())
-            live_for_epoch = int(time.time()) - first_seen
+            for channel, options in settings["notify"].items():
+                # The role is only mentioned when a stream goes live
+                contents = [
+                    (self._started_content(server, status.url, stream), options["role"])
+                    for stream in diff.started
+                ]
+                if options["ended"]:
+                    contents.extend((self._ended_content(stream), None) for stream in diff.ended)
+                if contents:
+                    jobs.append((guild, int(channel), contents))
+
+        semaphore = asyncio.Semaphore(self.parallelism)
+
+        async def notify(
+            guild: discord.Guild, channel: int, contents: List[Tuple[str, Optional[int]]]
+        ):
+            async with semaphore:
+                for content, role in contents:
+                    await self._send_notification(guild, channel, content, role)
+
+        results = await asyncio.gather(*(notify(*job) for job in jobs), return_exceptions=True)
+        for (guild, channel, _contents), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                self.metrics.inc("publish_errors")
+                log.error(f"Error notifying channel {channel} in guild {guild.name}: {result!r}")
+
+    def _started_content(self, server: str, url: str, stream: Stream) -> str:
+        stream_url = url.replace("api/status", stream.name)
+        return _("🔴 **{name}** is live on {server}: {url}").format(
+            name=stream.name, server=server, url=stream_url
+        )
+
+    def _ended_content(self, stream: Stream) -> str:
+        return _("**{name}** is no longer live.").format(name=stream.name)
+
+    async def _send_notification(
+        self, guild: discord.Guild, channel: int, content: str, role: Optional[int] = None
+    ):
+        target_channel = self.bot.get_channel(channel)
+        if target_channel is None:
+            log.error(f"Channel {channel} not found in guild {guild.name}.")
+            return
+
+        if role is None:
+            allowed_mentions = discord.AllowedMentions.none()
+        else:
+            content = f"<@&{role}> {content}"
+            allowed_mentions = discord.AllowedMentions(
+                everyone=False, users=False, roles=[discord.Object(id=role)]
+            )
+
+        if self._guild_settings(guild.id)["delivery"] == "webhook":
+            webhook = await self._get_webhook(guild, target_channel)
+            if webhook is not None:
+                try:
+                    self.metrics.inc("discord_requests", action="webhook_send")
+                    await webhook.send(
+                        content,
+                        username=self.bot.user.display_name,
+                        avatar_url=self.bot.user.display_avatar.url,
+                        allowed_mentions=allowed_mentions,
+                    )
+                    return
+                except discord.errors.NotFound:
+                    log.warning(f"Webhook for {channel} was deleted, sending as the bot.")
+                    await self._forget_webhook(guild, channel)
+
+        self.metrics.inc("discord_requests", action="send")
+        await target_channel.send(content, allowed_mentions=allowed_mentions)
+
+    async def _set_notify(
+        self, guild: discord.Guild, channel: int, options: Optional[Dict[str, Any]]
+    ):
+        """Put a channel in notification mode with `options`, or back to the embed with `None`."""
+        notify = dict(self._guild_settings(guild.id)["notify"])
+        if options is None:
+            if notify.pop(str(channel), None) is None:
+                return
+        else:
+            notify[str(channel)] = options
+        await self._set_guild_setting(guild, "notify", notify)
+
+    async def _retire_message(self, guild: discord.Guild, channel: discord.TextChannel):
+        """Delete the live status messages in `channel` and stop tracking them."""
+        await self._delete_pages(guild, channel, 0)
+
+    async def _delete_pages(self, guild: discord.Guild, channel: discord.TextChannel, keep: int):
+        """Delete the live status messages of every page after the first `keep`."""
+        message_ids = self.message_ids.get(channel.id, [])
+        if len(message_ids) <= keep:
+            return
+
+        webhook = None
+        if self._guild_settings(guild.id)["delivery"] == "webhook":
+            webhook = self._known_webhook(guild, channel.id)
+        for message_id in message_ids[keep:]:
+            await self._delete_message(channel, message_id, webhook)
+        await self._remember_messages(guild, channel.id, message_ids[:keep])
+
+    async def _delete_message(
+        self,
+        channel: discord.TextChannel,
+        message_id: int,
+        webhook: Optional[discord.Webhook] = None,
+    ):
+        """Delete a live status message through `webhook` if it sent it, else as the bot."""
+        try:
+            if webhook is not None:
+                self.metrics.inc("discord_requests", action="webhook_delete")
+                await webhook.delete_message(message_id)
+            else:
+                self.metrics.inc("discord_requests", action="delete")
+                await channel.get_partial_message(message_id).delete()
+        except (discord.errors.NotFound, discord.errors.Forbidden):
+            log.debug(f"Couldn't delete live status message {message_id} in {channel.id}.")
+
+    def _group_subscribers(self, guilds: List[discord.Guild]) -> Dict[str, Dict[str, Any]]:
+        """Group guilds with subscribed channels by the status URLs they follow.
+
+        Each group holds the smallest interval among its guilds and the
+        `(guild, channels)` pairs that depend on that URL, a guild following
+        several servers is in each of their groups. Channels in notification
+        mode are left out, they are posted to when streams change.
+        """
+        subscribers: Dict[str, Dict[str, Any]] = {}
+        for guild in guilds:
+            settings = self._guild_settings(guild.id)
+            channels = settings["channels"]
+            if not channels:
+                continue
+
+            interval = settings["interval"]
+            notify = settings["notify"]
+            if notify:
+                channels = [channel for channel in channels if str(channel) not in notify]
+            for url in self._guild_servers(guild.id).values():
+                group = subscribers.setdefault(url, {"interval": interval, "guilds": []})
+                group["interval"] = min(group["interval"], interval)
+                group["guilds"].append((guild, channels))
+        return subscribers
+
+    def _is_unchanged(self, channel: int, page: int, digest: str, uptime_refresh: int) -> bool:
+        """Whether `page` of `channel` already shows `digest` and is fresh enough."""
+        rendered = self.digests.get(channel, [])
+        if page >= len(self.message_ids.get(channel, [])) or page >= len(rendered):
+            return False
+
+        last_digest, rendered_at = rendered[page]
+        if last_digest != digest:
+            return False
+        return not uptime_refresh or time.time() - rendered_at < uptime_refresh * 60
+
+    def _set_digest(self, channel: int, page: int, digest: str):
+        rendered = self.digests.setdefault(channel, [])
+        if page < len(rendered):
+            # A refresh of the clocks alone isn't worth a write
+            if rendered[page][0] != digest:
+                self.digests_dirty = True
+            rendered[page] = (digest, time.time())
+        else:
+            rendered.append((digest, time.time()))
+            self.digests_dirty = True
+
+    async def _format_embed(self, status: AggregateStatus, page: int = 0) -> discord.Embed:
+        health = status.health
+        up = sum(bool(healthy) for _name, healthy in health)
+        if up == len(health):
+            connection_color = 0x00FF00
+        elif up:
+            connection_color = 0xFFA500
+        else:
+            connection_color = 0xFF0000
+
+        embed = discord.Embed(title=EMBED_TITLE, color=connection_color)
+        if page == 0:
+            lines = []
+            for name, healthy in health:
+                connection_status = {True: "✅", False: "‼️", None: "⏳"}[healthy]
+                lines.append(f"{name}: {connection_status}")
+            embed.description = "\n".join(lines)
+        if len(status.pages) > 1:
+            embed.set_footer(text=f"Page {page + 1}/{len(status.pages)}")
+
+        for live in status.pages[page]:
+            stream = live.stream
+            stream_key = stream.name
+            sessions = stream.sessions
+            live_for_epoch = int(time.time()) - stream.first_seen
             hours, remainder = divmod(live_for_epoch, 3600)
             minutes, seconds = divmod(remainder, 60)
 
-            stream_url = url.replace("api/status", stream_key)
+            stream_url = live.url.replace("api/status", stream_key)
             embed.add_field(
-                name=stream_key,
+                # Which server a stream is on only matters when there are several
+                name=stream_key if len(health) == 1 else f"{stream_key} ({live.server})",
                 value=f"[URL]({stream_url}), Sessions: {sessions}, Live for: {hours:0>2d}:{minutes:0>2d}:{seconds:0>2d}",
                 inline=False,
             )
-            streams += 1
 
-        if not streams:
+        if not status.pages[0]:
             embed.add_field(name="No streams online", value="", inline=False)
 
         return embed
 
-    async def _publish_update(self, guild: discord.Guild, channel: int):
-        url = await self.conf.guild(guild).url()
-        url_bb_status = await self.conf.url_bb_status()
+    def _aggregate(self, servers: Dict[str, str]) -> Optional[AggregateStatus]:
+        """The merged view of `servers`, `None` if none of them has a status yet.
+
+        Views are shared by every guild following the same servers and only
+        rebuilt when one of the statuses is replaced.
+        """
+        key = tuple(servers.items())
+        statuses = tuple(self.url_bb_status.get(url) for url in servers.values())
+        if all(status is None for status in statuses):
+            return None
+
+        failing = tuple(self._is_failing(url) for url in servers.values())
+        view = self.views.get(key)
+        # Statuses compare by identity, a new fetch or push replaces the object
+        if view is None or view.statuses != statuses or view.failing != failing:
+            view = self.views[key] = AggregateStatus(key, statuses, failing)
+        return view
+
+    def _is_failing(self, url: str) -> bool:
+        """Whether the last request to `url` failed."""
+        controller = self.poll_controllers.get(url)
+        return controller is not None and controller.last_ok is False
+
+    async def _publish_update(self, guild: discord.Guild, channel: int, force: bool = False):
+        settings = self._guild_settings(guild.id)
+        servers = self._guild_servers(guild.id)
+        missing = [url for url in servers.values() if url not in self.url_bb_status]
+        if missing:
+            await asyncio.gather(
+                *(self._get_current_status(url, settings["interval"]) for url in missing)
+            )
+
+        status = self._aggregate(servers)
+        if status is None:
+            return
+
+        # Each page is its own message, only the pages whose streams changed are edited
+        digests = status.page_digests
+        changed = [
+            page
+            for page, digest in enumerate(digests)
+            if force or not self._is_unchanged(channel, page, digest, settings["uptime_refresh"])
+        ]
+        if len(changed) < len(digests):
+            self.metrics.inc("skipped_edits", len(digests) - len(changed))
+        surplus = len(self.message_ids.get(channel, [])) > len(digests)
+        if not changed and not surplus:
+            return
+
+        target_channel = self.bot.get_channel(channel)
+        if target_channel is None:
+            log.error(f"Channel {channel} not found in guild {guild.name}.")
+            return
+
+        for page in changed:
+            embed = await self._format_embed(status, page)
+            if settings["delivery"] != "webhook" or not await self._deliver_webhook(
+                guild, target_channel, embed, page
+            ):
+                await self._deliver_bot(guild, target_channel, embed, page)
+            self._set_digest(channel, page, digests[page])
+        if surplus:
+            await self._delete_pages(guild, target_channel, len(digests))
 
-        if url not in url_bb_status:
-            resp = await self._get_current_status(guild, url)
-            log.warning(f"From get_current_status resp: {resp}")
-            if resp is None:
+    async def _deliver_bot(
+        self,
+        guild: discord.Guild,
+        channel: discord.TextChannel,
+        embed: discord.Embed,
+        page: int = 0,
+    ):
+        message_ids = self.message_ids.get(channel.id, [])
+        if page < len(message_ids):
+            message_id = message_ids[page]
+            try:
+                self.metrics.inc("discord_requests", action="edit")
+                await channel.get_partial_message(message_id).edit(embed=embed)
                 return
+            except discord.errors.NotFound:
+                log.debug(f"Live status message {message_id} in {channel.id} was deleted.")
+            except discord.errors.Forbidden:
+                # Left over from webhook delivery, the bot can't edit the webhook's messages.
+                # It's replaced below, so don't leave it frozen next to the new one.
+                log.debug(f"Can't edit live status message {message_id} in {channel.id}.")
+                await self._delete_message(
+                    channel, message_id, self._known_webhook(guild, channel.id)
+                )
 
-        bb_data = url_bb_status.get(url, {}).get("data")
-        bb_resp_status = url_bb_status.get(url, {}).get("resp_status")
+        # Only the first page is looked for, the others are sent after it
+        previous_message = await self._find_previous_message(channel) if page == 0 else None
+        if previous_message is not None:
+            self.metrics.inc("discord_requests", action="edit")
+            await previous_message.edit(embed=embed)
+        else:
+            self.metrics.inc("discord_requests", action="send")
+            previous_message = await channel.send(embed=embed)
 
-        embed = await self._format_embed(url, bb_data, bb_resp_status)
-        previous_message = None
+        await self._remember_page(guild, channel.id, page, previous_message.id)
 
-        async for message in self.bot.get_channel(channel).history(limit=5):
-            if message.author == self.bot.user and message.embeds:
-                if message.embeds[0].title == EMBED_TITLE:
-                    previous_message = message.id
-                    break
+    async def _deliver_webhook(
+        self,
+        guild: discord.Guild,
+        channel: discord.TextChannel,
+        embed: discord.Embed,
+        page: int = 0,
+    ) -> bool:
+        """Post or edit the embed through the channel's webhook.
 
-        channel = self.bot.get_channel(channel)
+        Returns `False` when no webhook can be used and the caller should fall
+        back to sending as the bot.
+        """
+        webhook = await self._get_webhook(guild, channel)
+        if webhook is None:
+            return False
 
-        if previous_message:
+        message_ids = self.message_ids.get(channel.id, [])
+        if page < len(message_ids):
+            message_id = message_ids[page]
             try:
-                await channel.fetch_message(previous_message)
+                self.metrics.inc("discord_requests", action="webhook_edit")
+                await webhook.edit_message(message_id, embed=embed)
+                return True
             except discord.errors.NotFound:
-                await channel.send(embed=embed)
-            else:
-                await message.edit(embed=embed)
+                log.debug(f"Live status message {message_id} in {channel.id} was deleted.")
+
+        try:
+            self.metrics.inc("discord_requests", action="webhook_send")
+            message = await webhook.send(
+                embed=embed,
+                username=self.bot.user.display_name,
+                avatar_url=self.bot.user.display_avatar.url,
+                wait=True,
+            )
+        except discord.errors.NotFound:
+            log.warning(f"Webhook for {channel.id} was deleted, sending as the bot.")
+            await self._forget_webhook(guild, channel.id)
+            return False
+
+        await self._remember_page(guild, channel.id, page, message.id)
+        return True
+
+    async def _get_webhook(
+        self, guild: discord.Guild, channel: discord.TextChannel
+    ) -> Optional[discord.Webhook]:
+        """The webhook used to deliver to `channel`, found or created on first use.
+
+        Webhooks are bound to the cog's session so their requests share its pool.
+        """
+        if channel.id in self.webhooks:
+            return self.webhooks[channel.id]
+
+        webhooks = dict(self._guild_settings(guild.id)["webhooks"])
+        url = webhooks.get(str(channel.id))
+        if url is None:
+            try:
+                url = await self._create_webhook(channel)
+            except discord.errors.Forbidden:
+                log.warning(
+                    f"No permission to manage webhooks in {channel.id}, sending as the bot."
+                )
+                self.webhooks[channel.id] = None
+                return None
+
+            webhooks[str(channel.id)] = url
+            await self._set_guild_setting(guild, "webhooks", webhooks)
+
+        webhook = discord.Webhook.from_url(url, session=self.session)
+        self.webhooks[channel.id] = webhook
+        return webhook
+
+    def _known_webhook(self, guild: discord.Guild, channel: int) -> Optional[discord.Webhook]:
+        """The webhook already used to deliver to `channel`, without creating one."""
+        if channel in self.webhooks:
+            return self.webhooks[channel]
+
+        url = self._guild_settings(guild.id)["webhooks"].get(str(channel))
+        if url is None:
+            return None
+        webhook = discord.Webhook.from_url(url, session=self.session)
+        self.webhooks[channel] = webhook
+        return webhook
+
+    async def _create_webhook(self, channel: discord.TextChannel) -> str:
+        for webhook in await channel.webhooks():
+            if webhook.user == self.bot.user and webhook.name == WEBHOOK_NAME and webhook.token:
+                return webhook.url
+        return (await channel.create_webhook(name=WEBHOOK_NAME)).url
+
+    async def _forget_webhook(self, guild: discord.Guild, channel: int):
+        self.webhooks.pop(channel, None)
+        webhooks = dict(self._guild_settings(guild.id)["webhooks"])
+        if webhooks.pop(str(channel), None) is not None:
+            await self._set_guild_setting(guild, "webhooks", webhooks)
+
+    async def _find_previous_message(
+        self, channel: discord.TextChannel
+    ) -> Optional[discord.Message]:
+        self.metrics.inc("discord_requests", action="history")
+        # Messages of the other pages have the same title
+        owned = self.message_ids.get(channel.id, [])
+        async for message in channel.history(limit=5):
+            if message.id in owned:
+                continue
+            if message.author == self.bot.user and message.embeds:
+                if message.embeds[0].title == EMBED_TITLE:
+                    return message
+        return None
+
+    async def _remember_page(self, guild: discord.Guild, channel: int, page: int, message_id: int):
+        """Store the message showing `page`, pages are sent in order so a new one comes last."""
+        message_ids = list(self.message_ids.get(channel, []))
+        if page < len(message_ids):
+            message_ids[page] = message_id
+        else:
+            message_ids.append(message_id)
+        await self._remember_messages(guild, channel, message_ids)
+
+    async def _remember_messages(self, guild: discord.Guild, channel: int, message_ids: List[int]):
+        """Store or forget (with an empty list) the live status messages owned in a channel."""
+        if self.message_ids.get(channel, []) == message_ids:
+            return
+
+        if not message_ids:
+            self.message_ids.pop(channel, None)
+            self.digests.pop(channel, None)
         else:
-            await channel.send(embed=embed)
+            self.message_ids[channel] = message_ids
+            # Pages that no longer have a message have to be rendered again
+            del self.digests.get(channel, [])[len(message_ids) :]
+        self.digests_dirty = True
+        await self._set_guild_entry(guild, "messages", str(channel), message_ids or None)
 
     def __init__(self, bot):
         self.bot = bot
         self.conf = Config.get_conf(self, identifier=UNIQUE_ID, force_registration=True)
-        self.conf.register_guild(channels=[], interval=60, url=BB_URL)
-        self.conf.register_global(url_bb_status={})
+        self.conf.register_guild(**DEFAULT_GUILD)
+        self.conf.register_global(
+            url_bb_status={},
+            digests={},
+            connect_timeout=10,
+            read_timeout=30,
+            parallelism=10,
+            push_port=None,
+            push_host="127.0.0.1",
+            push_token=None,
+            coordination_path=None,
+            metrics_port=None,
+            metrics_host="127.0.0.1",
+        )
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.client_timeout: Optional[aiohttp.ClientTimeout] = None
+        self.parallelism = 10
+        # Background loops read settings from memory, commands write through to Config
+        self.settings: Dict[int, Dict[str, Any]] = {}
+        self.url_bb_status: Dict[str, ServerStatus] = {}
+        # status URL -> streams that started, ended or changed on its last fetch
+        self.status_diffs: Dict[str, StatusDiff] = {}
+        self.status_dirty = False
+        # servers a guild follows -> their merged view, shared by guilds following the same ones
+        self.views: Dict[Tuple[Tuple[str, str], ...], AggregateStatus] = {}
+        self.scheduler = GuildScheduler()
+        # key -> request shared by every concurrent caller
+        self.inflight: Dict[str, asyncio.Future] = {}
+        # status URL -> backoff and circuit breaker state of that server
+        self.poll_controllers: Dict[str, PollController] = {}
+        # channel ID -> IDs of the live status messages the cog owns in it, one per page
+        self.message_ids: Dict[int, List[int]] = {}
+        # channel ID -> webhook used for delivery, `None` if one can't be created
+        self.webhooks: Dict[int, Optional[discord.Webhook]] = {}
+        # channel ID -> (digest of the rendered streams, time it was rendered) per page
+        self.digests: Dict[int, List[Tuple[str, float]]] = {}
+        self.digests_dirty = False
+        self.push_server: Optional[PushServer] = None
+        # status URLs that pushed an update, these are only polled to reconcile
+        self.pushed: Set[str] = set()
+        self.metrics = Metrics("broadcastboxlive")
+        self.metrics_server: Optional[MetricsServer] = None
+        self.coordinator: Optional[SharedCache] = None
+        # guild ID -> channels an overrun tick didn't get to
+        self.carry_over: Dict[int, Set[int]] = {}
+
+    async def cog_load(self):
+        self.parallelism = await self.conf.parallelism()
+        # Entries stored before the status was compacted are refetched on the first tick
+        self.url_bb_status = {
+            url: ServerStatus.from_dict(url, status)
+            for url, status in (await self.conf.url_bb_status()).items()
+            if "streams" in status
+        }
+        self.settings = await self.conf.all_guilds()
+        for guild_id, guild_data in self.settings.items():
+            for channel, message_ids in guild_data["messages"].items():
+                # Stored as a single ID before statuses were split into pages
+                if isinstance(message_ids, int):
+                    message_ids = [message_ids]
+                self.message_ids[int(channel)] = message_ids
+            if guild_data["channels"]:
+                # Spread the first checks over the interval instead of all at once
+                self.scheduler.schedule(guild_id, guild_data["interval"], jitter=True)
+        for channel, rendered in (await self.conf.digests()).items():
+            message_ids = self.message_ids.get(int(channel), [])
+            # Only digests of messages the cog still owns say what a channel shows,
+            # a single pair was stored before pagination and is rendered again
+            if message_ids and all(isinstance(page, list) for page in rendered):
+                self.digests[int(channel)] = [tuple(page) for page in rendered][: len(message_ids)]
+        self.client_timeout = await self._build_timeout()
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=POOL_LIMIT,
+                limit_per_host=POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ),
+            timeout=self.client_timeout,
+        )
+        try:
+            await self._start_push_server()
+        except OSError as e:
+            log.error(f"Couldn't start the push server, only polling. Exception: {e!r}")
+        try:
+            await self._start_metrics_server()
+        except OSError as e:
+            log.error(f"Couldn't start the metrics server. Exception: {e!r}")
+        path = await self.conf.coordination_path()
+        if path is not None:
+            try:
+                await self._start_coordination(Path(path))
+            except (sqlite3.Error, OSError) as e:
+                log.error(f"Couldn't open {path}, polling without coordination. Exception: {e!r}")
         self.background_check_for_update.start()
+        self.watch_loop_lag.start()
+
+    async def _start_metrics_server(self):
+        """(Re)start the Prometheus endpoint on the configured port, if there is one."""
+        await self._stop_metrics_server()
+        port = await self.conf.metrics_port()
+        if port is None:
+            return
+
+        server = MetricsServer(self.metrics, self._collect_metrics)
+        await server.start(await self.conf.metrics_host(), port)
+        self.metrics_server = server
+
+    async def _stop_metrics_server(self):
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+            self.metrics_server = None
+
+    def _collect_metrics(self):
+        """Refresh the gauges that are only computed when metrics are read."""
+        now = time.time()
+        for url, status in self.url_bb_status.items():
+            self.metrics.set("status_age_seconds", now - status.last_checked, url=url)
+            self.metrics.set("live_streams", len(status.streams), url=url)
+        self.metrics.set("scheduled_guilds", len(self.scheduler))
+        self.metrics.set(
+            "live_messages", sum(len(message_ids) for message_ids in self.message_ids.values())
+        )
+
+    async def _start_coordination(self, path: Path):
+        await self._stop_coordination()
+        coordinator = SharedCache(path)
+        await coordinator.setup()
+        self.coordinator = coordinator
+
+    async def _stop_coordination(self):
+        """Hand the servers this process polls over to the other processes right away."""
+        if self.coordinator is None:
+            return
+
+        coordinator, self.coordinator = self.coordinator, None
+        try:
+            await coordinator.release_all()
+        except sqlite3.Error as e:
+            log.warning(f"Couldn't release the polling leases. Exception: {e!r}")
+
+    async def _build_timeout(self) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(
+            connect=await self.conf.connect_timeout(),
+            sock_read=await self.conf.read_timeout(),
+        )
 
     async def red_delete_data_for_user(self, *args, **kwargs) -> None:
         """Nothing to delete."""
@@ -219,25 +1114,91 @@ class BroadcastBoxLive(commands.Cog):
     async def init_loop(self):
         await self.bot.wait_until_ready()
 
-    @tasks.loop(seconds=60)
+    @tasks.loop(seconds=0)
     async def background_check_for_update(self):
-        for guild in self.bot.guilds:
-            channels = await self.conf.guild(guild).channels()
-            if len(channels) == 0:
-                continue
+        # Sleep until the next guild is due, each guild runs on its own interval
+        due = await self.scheduler.wait_due()
+        with self.metrics.timer("tick_seconds"):
+            started = time.monotonic()
+            guilds = []
+            for guild_id in due:
+                guild = self.bot.get_guild(guild_id)
+                settings = self._guild_settings(guild_id)
+                if not settings["channels"]:
+                    self.carry_over.pop(guild_id, None)
+                    continue
 
-            url = await self.conf.guild(guild).url()
-            await self._get_current_status(guild, url)
+                # A guild missing during an outage is tried again on its next turn
+                self.scheduler.schedule(guild_id, settings["interval"])
+                if guild is not None:
+                    guilds.append(guild)
 
-            for channel in channels:
-                await self._publish_update(guild, channel)
+            # The tick has to be done before the most frequent of its guilds is due again
+            subscribers = self._group_subscribers(guilds)
+            intervals = [group["interval"] for group in subscribers.values()]
+            deadline = max(MIN_TICK_DEADLINE, min(intervals, default=0))
+
+            # Fetch each distinct status URL once, then fan the result out to every
+            # due guild that depends on it. Channels left over from an overrun tick go first.
+            await self._fetch_due(subscribers, deadline * FETCH_DEADLINE_SHARE)
+            carried, jobs = [], []
+            queued = set()
+            for group in subscribers.values():
+                for guild, channels in group["guilds"]:
+                    # Guilds following several servers are in several groups, update them once
+                    if guild.id in queued:
+                        continue
+                    queued.add(guild.id)
+                    leftover = self.carry_over.pop(guild.id, set())
+                    for channel in channels:
+                        (carried if channel in leftover else jobs).append((guild, channel))
+
+            remaining = max(0.0, deadline - (time.monotonic() - started))
+            unfinished = await self._dispatch_updates(carried + jobs, remaining)
+            if unfinished:
+                self._carry_over(unfinished, deadline)
+            await self._flush_status()
+
+    def _carry_over(self, unfinished: List[Tuple[discord.Guild, int]], deadline: float):
+        """Retry channels a tick couldn't update soon, ahead of everything else."""
+        self.metrics.inc("tick_overruns")
+        self.metrics.inc("carried_over", len(unfinished))
+        log.warning(
+            f"Couldn't update {len(unfinished)} channels within {deadline:g} seconds,"
+            f" retrying them in {CARRY_OVER_DELAY} seconds."
+        )
+        for guild, channel in unfinished:
+            self.carry_over.setdefault(guild.id, set()).add(channel)
+        for guild_id in self.carry_over:
+            self.scheduler.schedule(guild_id, CARRY_OVER_DELAY)
 
     @background_check_for_update.before_loop
     async def wait_for_red(self):
         await self.bot.wait_until_red_ready()
 
+    @tasks.loop(seconds=0)
+    async def watch_loop_lag(self):
+        """Warn when the event loop is blocked, which delays commands as much as updates."""
+        started = time.monotonic()
+        await asyncio.sleep(LAG_CHECK_INTERVAL)
+        lag = time.monotonic() - started - LAG_CHECK_INTERVAL
+        self.metrics.observe("loop_lag_seconds", lag)
+        if lag > LAG_WARNING:
+            log.warning(f"The event loop was blocked for {lag:.2f} seconds.")
+
     async def cog_unload(self):
         self.background_check_for_update.cancel()
+        self.watch_loop_lag.cancel()
+        await self._stop_push_server()
+        await self._stop_metrics_server()
+        await self._stop_coordination()
+        # Keep when each server was last checked and each message was last rendered, so a
+        # restart neither refetches the servers nor re-edits messages whose clocks are fresh
+        self.status_dirty = True
+        self.digests_dirty = True
+        await self._flush_status()
+        if self.session is not None:
+            await self.session.close()
 
     @commands.group()
     async def bbl(self, ctx: commands.Context):
@@ -250,7 +1211,7 @@ class BroadcastBoxLive(commands.Cog):
         """
         Set the interval in seconds to check for updates.
 
-        Default is 60 seconds
+        Each server has its own interval. Default is 60 seconds
         Please be nice to the Broadcast Box server ❤️
         """
 
@@ -259,7 +1220,7 @@ class BroadcastBoxLive(commands.Cog):
 
         async with ctx.channel.typing():
             if interval is None:
-                interval = await self.conf.guild(ctx.guild).interval()
+                interval = self._guild_settings(ctx.guild.id)["interval"]
                 await ctx.send(
                     info(_("Currently checking every {number} seconds.").format(number=interval))
                 )
@@ -268,8 +1229,9 @@ class BroadcastBoxLive(commands.Cog):
                 await ctx.send(error(_("You cannot set the interval to less than 20 seconds.")))
                 return
 
-            await self.conf.guild(ctx.guild).interval.set(interval)
-            self.background_check_for_update.change_interval(seconds=interval)
+            await self._set_guild_setting(ctx.guild, "interval", interval)
+            if ctx.guild.id in self.scheduler:
+                self.scheduler.schedule(ctx.guild.id, interval, jitter=True)
             await ctx.send(
                 success(
                     _("Now checking every {number} seconds for a new streams.").format(
@@ -278,6 +1240,420 @@ class BroadcastBoxLive(commands.Cog):
                 )
             )
 
+    @checks.admin_or_permissions()
+    @commands.guild_only()
+    @bbl.command(name="uptimerefresh", usage="Optional[minutes]")
+    async def uptimeRefresh(self, ctx: commands.Context, minutes: Optional[int] = None):
+        """
+        Set how often in minutes the live-for clocks are refreshed.
+
+        The embed is always updated when streams start, stop or gain viewers.
+        Otherwise it is only edited this often to keep the uptimes current.
+        Set to 0 to only update on changes. Default is 10 minutes.
+        """
+
+        if ctx.message.author.bot:
+            return
+
+        if minutes is None:
+            minutes = self._guild_settings(ctx.guild.id)["uptime_refresh"]
+            await ctx.send(
+                info(
+                    _("Currently refreshing uptimes every {number} minutes.").format(
+                        number=minutes
+                    )
+                )
+            )
+            return
+        elif minutes < 0:
+            await ctx.send(error(_("The refresh interval cannot be negative.")))
+            return
+
+        await self._set_guild_setting(ctx.guild, "uptime_refresh", minutes)
+        if minutes:
+            await ctx.send(
+                success(_("Now refreshing uptimes every {number} minutes.").format(number=minutes))
+            )
+        else:
+            await ctx.send(success(_("Now only updating when streams change.")))
+
+    @checks.admin_or_permissions(manage_guild=True)
+    @commands.guild_only()
+    @bbl.command(usage="Optional[bot|webhook]")
+    async def delivery(self, ctx: commands.Context, mode: Optional[str] = None):
+        """
+        Choose whether updates are sent as the bot or through a webhook.
+
+        Webhooks have their own rate limits, so updates to many channels don't
+        compete with the bot's commands. They need the Manage Webhooks
+        permission, without it updates are sent as the bot.
+        """
+
+        if ctx.message.author.bot:
+            return
+
+        settings = self._guild_settings(ctx.guild.id)
+        if mode is None:
+            await ctx.send(
+                info(_("Currently sending updates as {mode}.").format(mode=settings["delivery"]))
+            )
+            return
+
+        mode = mode.lower()
+        if mode not in ("bot", "webhook"):
+            await ctx.send(error(_("Delivery must be either `bot` or `webhook`.")))
+            return
+
+        if mode == "webhook":
+            # Retry channels where creating a webhook failed before
+            for channel in settings["channels"]:
+                if channel in self.webhooks and self.webhooks[channel] is None:
+                    del self.webhooks[channel]
+
+        if mode != settings["delivery"]:
+            # The other sender can't edit the current messages, delete them as the sender
+            # that owns them and start fresh ones
+            for channel in list(settings["messages"]):
+                target_channel = self.bot.get_channel(int(channel))
+                if target_channel is not None:
+                    await self._delete_pages(ctx.guild, target_channel, 0)
+                else:
+                    await self._remember_messages(ctx.guild, int(channel), [])
+                self.webhooks.pop(int(channel), None)
+            await self._set_guild_setting(ctx.guild, "delivery", mode)
+
+        await ctx.send(success(_("Now sending updates as {mode}.").format(mode=mode)))
+
+    @checks.admin_or_permissions(manage_guild=True)
+    @commands.guild_only()
+    @bbl.command(usage="<channel> Optional[role] Optional[ended]")
+    async def notify(
+        self,
+        ctx: commands.Context,
+        channel: discord.TextChannel,
+        role: Optional[discord.Role] = None,
+        ended: bool = False,
+    ):
+        """
+        Post a message when a stream goes live instead of editing the live embed.
+
+        - `<channel>`: A channel that is already receiving stream updates.
+        - `[role]`: A role to mention when a stream goes live.
+        - `[ended]`: Also post when a stream ends. Default is false.
+
+        Use `[p]bbl embed <channel>` to go back to the live embed.
+        """
+
+        if ctx.message.author.bot:
+            return
+
+        if channel.id not in self._guild_settings(ctx.guild.id)["channels"]:
+            await ctx.send(
+                error(
+                    _(
+                        "{channel} is not receiving stream updates,"
+                        " add it with `{prefix}bbl add {channel}` first."
+                    ).format(channel=channel.mention, prefix=ctx.prefix)
+                )
+            )
+            return
+
+        await self._set_notify(ctx.guild, channel.id, {"role": role and role.id, "ended": ended})
+        await self._retire_message(ctx.guild, channel)
+        await ctx.send(
+            success(
+                _("{channel} now gets a message when a stream goes live.").format(
+                    channel=channel.mention
+                )
+            )
+        )
+
+    @checks.admin_or_permissions(manage_guild=True)
+    @commands.guild_only()
+    @bbl.command(usage="<channel>")
+    async def embed(self, ctx: commands.Context, channel: discord.TextChannel):
+        """
+        Go back to the continuously updated live embed in a channel.
+        """
+
+        if ctx.message.author.bot:
+            return
+
+        if str(channel.id) not in self._guild_settings(ctx.guild.id)["notify"]:
+            await ctx.send(
+                info(
+                    _("{channel} is already showing the live embed.").format(
+                        channel=channel.mention
+                    )
+                )
+            )
+            return
+
+        await self._set_notify(ctx.guild, channel.id, None)
+        await self._publish_update(ctx.guild, channel.id, force=True)
+        await ctx.send(
+            success(_("{channel} now shows the live embed.").format(channel=channel.mention))
+        )
+
+    @checks.is_owner()
+    @bbl.command(name="httptimeout", usage="Optional[connect] Optional[read]")
+    async def httpTimeout(
+        self, ctx: commands.Context, connect: Optional[float] = None, read: Optional[float] = None
+    ):
+        """
+        Set the connect and read timeouts in seconds for Broadcast Box requests.
+
+        Applies to every guild. Default is 10 seconds to connect and 30 seconds to read.
+        """
+
+        if connect is None:
+            await ctx.send(
+                info(
+                    _("Current timeouts: {connect}s to connect, {read}s to read.").format(
+                        connect=await self.conf.connect_timeout(),
+                        read=await self.conf.read_timeout(),
+                    )
+                )
+            )
+            return
+
+        if read is None:
+            read = await self.conf.read_timeout()
+
+        if connect <= 0 or read <= 0:
+            await ctx.send(error(_("Timeouts must be greater than 0 seconds.")))
+            return
+
+        await self.conf.connect_timeout.set(connect)
+        await self.conf.read_timeout.set(read)
+        self.client_timeout = await self._build_timeout()
+        await ctx.send(
+            success(
+                _("Timeouts set to {connect}s to connect and {read}s to read.").format(
+                    connect=connect, read=read
+                )
+            )
+        )
+
+    @checks.is_owner()
+    @bbl.command(name="parallelism", usage="Optional[parallelism]")
+    async def setParallelism(self, ctx: commands.Context, parallelism: Optional[int] = None):
+        """
+        Set how many channels are updated at the same time.
+
+        Applies to every guild. Default is 10.
+        """
+
+        if parallelism is None:
+            await ctx.send(
+                info(
+                    _("Currently updating up to {number} channels at once.").format(
+                        number=self.parallelism
+                    )
+                )
+            )
+            return
+        elif not 1 <= parallelism <= MAX_PARALLELISM:
+            await ctx.send(
+                error(
+                    _("Parallelism must be between 1 and {maximum}.").format(
+                        maximum=MAX_PARALLELISM
+                    )
+                )
+            )
+            return
+
+        await self.conf.parallelism.set(parallelism)
+        self.parallelism = parallelism
+        await ctx.send(
+            success(_("Now updating up to {number} channels at once.").format(number=parallelism))
+        )
+
+    @checks.is_owner()
+    @bbl.command(usage="Optional[port|off] Optional[host]")
+    async def push(
+        self, ctx: commands.Context, port: Optional[str] = None, host: Optional[str] = None
+    ):
+        """
+        Receive status updates pushed by a Broadcast Box instance or a sidecar.
+
+        Starts a small web server on `port`, listening on `host` (default 127.0.0.1).
+        The access token is sent to you in a DM. POST to `/status` with
+        `{"url": ..., "streams": [...]}`, where `streams` is what `/api/status`
+        returns, or to `/event` with `{"url": ..., "streamKey": ..., "event": "start"}`
+        (or `"stop"`), authorized with `Authorization: Bearer <token>`.
+        Servers that push are still polled every 10 minutes to catch missed updates.
+
+        Use `off` to stop the server.
+        """
+
+        if port is None:
+            if self.push_server is None:
+                await ctx.send(info(_("Not receiving pushed updates.")))
+            else:
+                await ctx.send(
+                    info(
+                        _("Receiving pushed updates on {host}:{port}.").format(
+                            host=await self.conf.push_host(), port=await self.conf.push_port()
+                        )
+                    )
+                )
+            return
+
+        if port.lower() == "off":
+            await self.conf.push_port.set(None)
+            await self._stop_push_server()
+            self.pushed.clear()
+            await ctx.send(success(_("Stopped receiving pushed updates.")))
+            return
+
+        if not port.isdigit() or not 1 <= int(port) <= 65535:
+            await ctx.send(error(_("The port must be a number between 1 and 65535.")))
+            return
+
+        await self.conf.push_port.set(int(port))
+        if host is not None:
+            await self.conf.push_host.set(host)
+        try:
+            await self._start_push_server()
+        except OSError as e:
+            await self.conf.push_port.set(None)
+            await ctx.send(
+                error(_("Couldn't start the push server: {error}").format(error=e.strerror))
+            )
+            return
+
+        try:
+            await ctx.author.send(
+                _("Push token: `{token}`").format(token=await self.conf.push_token())
+            )
+        except discord.errors.Forbidden:
+            await ctx.send(error(_("I couldn't DM you the push token.")))
+        await ctx.send(
+            success(
+                _("Receiving pushed updates on {host}:{port}.").format(
+                    host=await self.conf.push_host(), port=port
+                )
+            )
+        )
+
+    @checks.is_owner()
+    @bbl.command()
+    async def stats(self, ctx: commands.Context):
+        """
+        Show counters and timings collected since the cog was loaded.
+
+        Timings are in seconds, percentiles are the upper bound of their bucket.
+        """
+
+        self._collect_metrics()
+        uptime = int(time.time() - self.metrics.started)
+        lines = [_("Collected over {seconds} seconds.").format(seconds=uptime)]
+        hits = self.metrics.counter("status_cache", result="hit")
+        lookups = self.metrics.counter("status_cache")
+        if lookups:
+            lines.append(_("Status cache hit rate: {rate:.1%}").format(rate=hits / lookups))
+        lines.append("")
+        lines.extend(self.metrics.summary())
+        for page in pagify("\n".join(lines), page_length=1900):
+            await ctx.send(box(page))
+
+    @checks.is_owner()
+    @bbl.command(usage="Optional[port|off] Optional[host]")
+    async def prometheus(
+        self, ctx: commands.Context, port: Optional[str] = None, host: Optional[str] = None
+    ):
+        """
+        Serve the collected metrics for Prometheus on `http://host:port/metrics`.
+
+        Listens on `host`, 127.0.0.1 by default. Use `off` to stop serving them.
+        """
+
+        if port is None:
+            if self.metrics_server is None:
+                await ctx.send(info(_("Not serving metrics.")))
+            else:
+                await ctx.send(
+                    info(
+                        _("Serving metrics on {host}:{port}.").format(
+                            host=await self.conf.metrics_host(),
+                            port=await self.conf.metrics_port(),
+                        )
+                    )
+                )
+            return
+
+        if port.lower() == "off":
+            await self.conf.metrics_port.set(None)
+            await self._stop_metrics_server()
+            await ctx.send(success(_("Stopped serving metrics.")))
+            return
+
+        if not port.isdigit() or not 1 <= int(port) <= 65535:
+            await ctx.send(error(_("The port must be a number between 1 and 65535.")))
+            return
+
+        await self.conf.metrics_port.set(int(port))
+        if host is not None:
+            await self.conf.metrics_host.set(host)
+        try:
+            await self._start_metrics_server()
+        except OSError as e:
+            await self.conf.metrics_port.set(None)
+            await ctx.send(
+                error(_("Couldn't start the metrics server: {error}").format(error=e.strerror))
+            )
+            return
+
+        await ctx.send(
+            success(
+                _("Serving metrics on {host}:{port}.").format(
+                    host=await self.conf.metrics_host(), port=port
+                )
+            )
+        )
+
+    @checks.is_owner()
+    @bbl.command(usage="Optional[path|off]")
+    async def coordinate(self, ctx: commands.Context, *, path: Optional[str] = None):
+        """
+        Share polling with the other bots on this machine through a SQLite file.
+
+        Give every bot the same `path`. For each Broadcast Box server one of
+        them polls it and the others reuse the result. If that bot stops,
+        another one takes over within a few minutes. The same file can be
+        used for FactorioCogFriday.
+
+        Use `off` to poll on this bot's own again.
+        """
+
+        if path is None:
+            current = await self.conf.coordination_path()
+            if current is None:
+                await ctx.send(info(_("Polling without coordination.")))
+            else:
+                await ctx.send(
+                    info(_("Coordinating through {path}.").format(path=inline(current)))
+                )
+            return
+
+        if path.lower() == "off":
+            await self.conf.coordination_path.set(None)
+            await self._stop_coordination()
+            await ctx.send(success(_("Now polling without coordination.")))
+            return
+
+        try:
+            await self._start_coordination(Path(path).expanduser())
+        except (sqlite3.Error, OSError) as e:
+            await ctx.send(
+                error(_("Couldn't use {path}: {error}").format(path=inline(path), error=e))
+            )
+            return
+
+        await self.conf.coordination_path.set(str(Path(path).expanduser()))
+        await ctx.send(success(_("Now coordinating through {path}.").format(path=inline(path))))
+
     @checks.admin_or_permissions(manage_guild=True)
     @commands.guild_only()
     @bbl.command(name="addchannel", aliases=["add"], usage="Optional[channel]")
@@ -318,11 +1694,23 @@ class BroadcastBoxLive(commands.Cog):
         - http://siobud.com/api/status
         - http://custom_domain.com:8080/api/status
         - http://192.168.1.1:3000/api/status
+
+        This replaces every server added with `addserver`.
         """
 
         if ctx.message.author.bot:
             return
 
+        if not await self._check_url(ctx, url):
+            return
+
+        await ctx.send(success(_("Broadcast Box URL set to {url}").format(url=url)))
+        await self._set_guild_setting(ctx.guild, "url", url)
+        await self._set_guild_setting(ctx.guild, "servers", {})
+        self.views.clear()
+
+    async def _check_url(self, ctx: commands.Context, url: str) -> bool:
+        """Whether `url` looks like a Broadcast Box status URL, explains why not if it doesn't."""
         if not url.startswith("http"):
             await ctx.send(
                 error(
@@ -331,11 +1719,9 @@ class BroadcastBoxLive(commands.Cog):
                     )
                 )
             )
-            return
+            return False
 
-        if url.endswith("/api/status"):
-            await ctx.send(success(_("Broadcast Box URL set to {url}").format(url=url)))
-        else:
+        if not url.endswith("/api/status"):
             await ctx.send(
                 error(
                     _(
@@ -343,9 +1729,118 @@ class BroadcastBoxLive(commands.Cog):
                     )
                 )
             )
+            return False
+        return True
+
+    @checks.admin_or_permissions(manage_guild=True)
+    @commands.guild_only()
+    @bbl.command(name="addserver", usage="<name> <url>")
+    async def addServer(self, ctx: commands.Context, name: str, url: str):
+        """
+        Follow another Broadcast Box server by name.
+
+        The live embed shows the streams of every server the guild follows
+        together, with the health of each server. Use quotes for names with
+        spaces. Adding a server that already exists changes its URL.
+
+        Example:
+        - `[p]bbl addserver Community https://bb.example.com/api/status`
+        """
+
+        if ctx.message.author.bot:
+            return
+
+        if len(name) > MAX_SERVER_NAME:
+            await ctx.send(
+                error(
+                    _("Server names can be at most {number} characters long.").format(
+                        number=MAX_SERVER_NAME
+                    )
+                )
+            )
+            return
+
+        if not await self._check_url(ctx, url):
+            return
+
+        # The URL followed so far is kept, under its host name
+        servers = dict(self._guild_servers(ctx.guild.id))
+        if name not in servers and len(servers) >= MAX_SERVERS:
+            await ctx.send(
+                error(_("You can follow at most {number} servers.").format(number=MAX_SERVERS))
+            )
+            return
+
+        if any(other != name and other_url == url for other, other_url in servers.items()):
+            await ctx.send(error(_("{url} is already followed.").format(url=url)))
+            return
+
+        servers[name] = url
+        await self._set_guild_setting(ctx.guild, "servers", servers)
+        self.views.clear()
+        await ctx.send(
+            success(_("Now following {name} at {url}.").format(name=inline(name), url=url))
+        )
+
+    @checks.admin_or_permissions(manage_guild=True)
+    @commands.guild_only()
+    @bbl.command(name="rmserver", usage="<name>")
+    async def removeServer(self, ctx: commands.Context, name: str):
+        """
+        Stop following a Broadcast Box server.
+
+        The last server can't be removed, use `seturl` to replace it.
+        """
+
+        if ctx.message.author.bot:
+            return
+
+        servers = dict(self._guild_servers(ctx.guild.id))
+        if name not in servers:
+            await ctx.send(error(_("No server is named {name}.").format(name=inline(name))))
+            return
+
+        if len(servers) == 1:
+            await ctx.send(
+                error(
+                    _(
+                        "You can't remove the last server, use `{prefix}bbl seturl` to replace it."
+                    ).format(prefix=ctx.prefix)
+                )
+            )
             return
 
-        await self.conf.guild(ctx.guild).url.set(url)
+        del servers[name]
+        await self._set_guild_setting(ctx.guild, "servers", servers)
+        self.views.clear()
+        await ctx.send(success(_("Stopped following {name}.").format(name=inline(name))))
+
+    @commands.guild_only()
+    @bbl.command(name="servers")
+    async def listServers(self, ctx: commands.Context):
+        """
+        List the Broadcast Box servers this server follows and their health.
+        """
+
+        if ctx.message.author.bot:
+            return
+
+        lines = []
+        for name, url in self._guild_servers(ctx.guild.id).items():
+            status = self.url_bb_status.get(url)
+            if self._is_failing(url):
+                health = _("last request failed")
+            elif status is None:
+                health = _("not checked yet")
+            else:
+                health = _("HTTP {code}, {streams} live, checked <t:{checked}:R>").format(
+                    code=status.resp_status,
+                    streams=len(status.streams),
+                    checked=status.last_checked,
+                )
+            lines.append(f"{inline(name)} {url} - {health}")
+        for page in pagify("\n".join(lines)):
+            await ctx.send(info(page))
 
     @commands.guild_only()
     @bbl.command(name="status")
@@ -358,5 +1853,19 @@ class BroadcastBoxLive(commands.Cog):
         if ctx.message.author.bot:
             return
 
-        if await self._get_current_status(ctx.guild, await self.conf.guild(ctx.guild).url()):
-            await self._publish_update(ctx.guild, ctx.channel.id)
+        servers = self._guild_servers(ctx.guild.id)
+        async with ctx.typing():
+            # Every server is checked at once, the slowest one sets how long this takes
+            await asyncio.gather(
+                *(self._get_current_status(url, STATUS_MAX_AGE) for url in servers.values())
+            )
+            if any(url in self.url_bb_status for url in servers.values()):
+                await self._publish_update(ctx.guild, ctx.channel.id, force=True)
+            else:
+                await ctx.send(
+                    error(
+                        _("Couldn't get the status of {url}.").format(
+                            url=", ".join(servers.values())
+                        )
+                    )
+                )
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import json
+import asyncio
+import secrets
+import sqlite3
+
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple, TypeVar
+
+__all__ = ["SharedCache"]
+
+T = TypeVar("T")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY, value TEXT NOT NULL, updated REAL NOT NULL
+);
+"""
+
+
+class SharedCache:
+    """Leases and upstream results shared by every bot process on a host.
+
+    Backed by one SQLite file. Each upstream has its own lease, the process
+    holding it polls that upstream and publishes the result, the others read
+    it from here. A lease nobody renews expires after its TTL and the next
+    process to ask takes over, so a process that dies or stops following an
+    upstream hands it over on its own.
+
+    Calls are blocking and run in the default executor.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        # Unique per process and per load, so a restarted bot doesn't inherit leases
+        self.holder = f"{os.getpid()}-{secrets.token_hex(4)}"
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.path), timeout=5, isolation_level=None)
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def _setup(self):
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    def _acquire(self, name: str, ttl: float) -> bool:
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT holder, expires FROM leases WHERE name = ?", (name,)
+            ).fetchone()
+            leader = row is None or row[0] == self.holder or row[1] < now
+            if leader:
+                connection.execute(
+                    "INSERT OR REPLACE INTO leases (name, holder, expires) VALUES (?, ?, ?)",
+                    (name, self.holder, now + ttl),
+                )
+            connection.execute("COMMIT")
+            return leader
+        finally:
+            connection.close()
+
+    def _release_all(self):
+        connection = self._connect()
+        try:
+            connection.execute("DELETE FROM leases WHERE holder = ?", (self.holder,))
+        finally:
+            connection.close()
+
+    def _publish(self, key: str, value: str):
+        connection = self._connect()
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, updated) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+        finally:
+            connection.close()
+
+    def _read(self, key: str) -> Optional[Tuple[str, float]]:
+        connection = self._connect()
+        try:
+            return connection.execute(
+                "SELECT value, updated FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        finally:
+            connection.close()
+
+    async def setup(self):
+        await self._run(self._setup)
+
+    async def acquire(self, name: str, ttl: float) -> bool:
+        """Take or renew the lease on `name` for `ttl` seconds, `False` if another holds it."""
+        return await self._run(self._acquire, name, ttl)
+
+    async def release_all(self):
+        """Give up every lease this process holds."""
+        await self._run(self._release_all)
+
+    async def publish(self, key: str, value: Any):
+        await self._run(self._publish, key, json.dumps(value, separators=(",", ":")))
+
+    async def read(self, key: str) -> Optional[Tuple[Any, float]]:
+        """The value last published under `key` and when, `None` if there is none."""
+        row = await self._run(self._read, key)
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
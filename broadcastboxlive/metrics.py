@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import time
+import bisect
+import logging
+
+from aiohttp import web
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+__all__ = ["Histogram", "Metrics", "MetricsServer"]
+
+log = logging.getLogger("red.redbotcogs.broadcastboxlive.metrics")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Upper bounds in seconds, suited to HTTP requests and loop ticks
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    """Counts of observations per bucket, Prometheus style."""
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # The extra slot counts observations above the largest bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the `q` quantile, `max` past the last bucket."""
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """A small in-process registry of counters, gauges and histograms.
+
+    Series are keyed by name and labels, updating one is a dict lookup and
+    an addition, so the hot paths can record freely.
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.started = time.time()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    @staticmethod
+    def _labels(labels: Dict[str, object]) -> Labels:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, amount: float = 1, **labels: object):
+        series = self.counters.setdefault(name, {})
+        key = self._labels(labels)
+        series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels: object):
+        self.gauges.setdefault(name, {})[self._labels(labels)] = value
+
+    def observe(self, name: str, value: float, **labels: object):
+        series = self.histograms.setdefault(name, {})
+        key = self._labels(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: object) -> Iterator[None]:
+        """Observe how long the block takes, in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def counter(self, name: str, **labels: object) -> float:
+        """A counter's value, summed over every series matching `labels`."""
+        wanted = set(self._labels(labels))
+        return sum(
+            value for key, value in self.counters.get(name, {}).items() if wanted.issubset(key)
+        )
+
+    def summary(self) -> List[str]:
+        """Human readable lines for every series."""
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            for labels, value in sorted(series.items()):
+                lines.append(f"{_series_name(name, labels)} {value:g}")
+        for name, series in sorted(self.gauges.items()):
+            for labels, value in sorted(series.items()):
+                lines.append(f"{_series_name(name, labels)} {value:g}")
+        for name, series in sorted(self.histograms.items()):
+            for labels, histogram in sorted(series.items()):
+                mean = histogram.sum / histogram.count if histogram.count else 0
+                lines.append(
+                    f"{_series_name(name, labels)} count={histogram.count}"
+                    f" mean={mean:.3f} p50<={histogram.quantile(0.5):.3f}"
+                    f" p95<={histogram.quantile(0.95):.3f} max={histogram.max:.3f}"
+                )
+        return lines
+
+    def render_prometheus(self) -> str:
+        """Every series in the Prometheus text exposition format."""
+        lines = []
+        for kind, metrics, suffix in (
+            ("counter", self.counters, "_total"),
+            ("gauge", self.gauges, ""),
+        ):
+            for name, series in sorted(metrics.items()):
+                full_name = f"{self.namespace}_{name}{suffix}"
+                lines.append(f"# TYPE {full_name} {kind}")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{_series_name(full_name, labels)} {value:g}")
+
+        for name, series in sorted(self.histograms.items()):
+            full_name = f"{self.namespace}_{name}"
+            lines.append(f"# TYPE {full_name} histogram")
+            for labels, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    bucket_labels = labels + (("le", f"{bound:g}"),)
+                    lines.append(
+                        f"{_series_name(full_name + '_bucket', bucket_labels)} {cumulative}"
+                    )
+                bucket_labels = labels + (("le", "+Inf"),)
+                lines.append(
+                    f"{_series_name(full_name + '_bucket', bucket_labels)} {histogram.count}"
+                )
+                lines.append(f"{_series_name(full_name + '_sum', labels)} {histogram.sum:g}")
+                lines.append(f"{_series_name(full_name + '_count', labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _series_name(name: str, labels: Labels) -> str:
+    if not labels:
+        return name
+    rendered = ",".join(
+        '{}="{}"'.format(key, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return f"{name}{{{rendered}}}"
+
+
+class MetricsServer:
+    """Serves `GET /metrics` in the Prometheus text format.
+
+    `collect` is called before every scrape to refresh gauges that are
+    cheaper to compute on demand than to keep up to date.
+    """
+
+    def __init__(self, metrics: Metrics, collect: Optional[Callable[[], None]] = None):
+        self.metrics = metrics
+        self.collect = collect
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self, host: str, port: int):
+        app = web.Application()
+        app.router.add_get("/metrics", self._metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, host, port).start()
+        except OSError:
+            await runner.cleanup()
+            raise
+        self._runner = runner
+        log.info(f"Serving metrics on {host}:{port}.")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        if self.collect is not None:
+            self.collect()
+        return web.Response(
+            text=self.metrics.render_prometheus(), content_type="text/plain", charset="utf-8"
+        )
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+import time
+import hashlib
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+__all__ = [
+    "Stream",
+    "StatusDiff",
+    "ServerStatus",
+    "LiveStream",
+    "AggregateStatus",
+    "parse_streams",
+    "diff_streams",
+    "paginate_streams",
+]
+
+# Discord allows 25 fields and 6000 characters per embed, part of the
+# character budget is left for the title, description and footer
+PAGE_FIELDS = 25
+PAGE_CHARS = 5000
+# Room for the URL markup, session count and live-for clock around a stream's
+# key, URL and server name, the clock only grows a digit after 100 hours
+FIELD_OVERHEAD = 64
+
+
+class Stream(NamedTuple):
+    """A live stream on a Broadcast Box server, keyed by its stream key."""
+
+    key: str
+    sessions: int
+    first_seen: int
+
+    @property
+    def name(self) -> str:
+        return self.key.replace("Bearer ", "")
+
+    @classmethod
+    def from_payload(
+        cls, stream: Dict[str, Any], first_seen: Optional[int] = None
+    ) -> Optional["Stream"]:
+        """Build a stream from an `/api/status` entry, `None` if it isn't broadcasting.
+
+        `first_seen` is used when the entry has no `firstSeenEpoch`, it defaults to now.
+        Raises `ValueError` for an entry that isn't shaped like a stream.
+        """
+        if not isinstance(stream, dict) or not isinstance(stream.get("streamKey"), str):
+            raise ValueError(f"Not a stream: {stream!r:.100}")
+
+        audio_packets_received = stream.get("audioPacketsReceived", 0)
+        video_streams = stream.get("videoStreams", [])
+
+        # Filter out non streamers
+        if audio_packets_received == 0 and not video_streams:
+            return None
+
+        whep_sessions = stream.get("whepSessions") or []
+        if not isinstance(whep_sessions, list):
+            raise ValueError(f"`whepSessions` of {stream['streamKey']} isn't a list.")
+
+        first_seen_epoch = stream.get("firstSeenEpoch")
+        if first_seen_epoch is None:
+            first_seen_epoch = first_seen or time.time()
+        elif isinstance(first_seen_epoch, bool) or not isinstance(first_seen_epoch, (int, float)):
+            raise ValueError(f"`firstSeenEpoch` of {stream['streamKey']} isn't a number.")
+
+        return cls(
+            key=stream["streamKey"],
+            sessions=len(whep_sessions),
+            first_seen=int(first_seen_epoch),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Stream":
+        return cls(data["streamKey"], data["sessions"], data["firstSeenEpoch"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "streamKey": self.key,
+            "sessions": self.sessions,
+            "firstSeenEpoch": self.first_seen,
+        }
+
+
+class StatusDiff(NamedTuple):
+    """Streams that started, ended or changed between two snapshots of a server."""
+
+    started: List[Stream]
+    ended: List[Stream]
+    changed: List[Stream]
+
+    def __bool__(self) -> bool:
+        return bool(self.started or self.ended or self.changed)
+
+
+def parse_streams(
+    data: List[Dict[str, Any]], previous: Optional[Dict[str, Stream]] = None
+) -> Dict[str, Stream]:
+    """Parse an `/api/status` payload into the live streams keyed by stream key.
+
+    Streams already in `previous` keep their first seen time if the payload
+    doesn't include one. Raises `ValueError` if the payload or one of its
+    entries is malformed, a server sending one is treated as failing.
+    """
+    if not isinstance(data, list):
+        raise ValueError(f"Expected a list of streams, got {type(data).__name__}.")
+
+    previous = previous or {}
+    streams = {}
+    for entry in data:
+        known = previous.get(entry.get("streamKey")) if isinstance(entry, dict) else None
+        stream = Stream.from_payload(entry, known.first_seen if known else None)
+        if stream is not None:
+            streams[stream.key] = stream
+    return streams
+
+
+def diff_streams(previous: Dict[str, Stream], current: Dict[str, Stream]) -> StatusDiff:
+    return StatusDiff(
+        started=[stream for key, stream in current.items() if key not in previous],
+        ended=[stream for key, stream in previous.items() if key not in current],
+        changed=[
+            stream
+            for key, stream in current.items()
+            if key in previous and previous[key] != stream
+        ],
+    )
+
+
+class LiveStream(NamedTuple):
+    """A stream with the name and status URL of the server it is live on."""
+
+    server: str
+    url: str
+    stream: Stream
+
+
+def paginate_streams(streams: Iterable[LiveStream]) -> List[List[LiveStream]]:
+    """Split streams into pages that each fit in one embed, always at least one page.
+
+    Streams are ordered by when they were first seen, then by server and key,
+    so a new stream lands on the last page and a stream ending only moves the
+    ones after it. Field sizes are estimated from the key, URL and server
+    name only, the split doesn't change as sessions and clocks tick.
+    """
+    pages: List[List[LiveStream]] = [[]]
+    size = 0
+    for live in sorted(
+        streams, key=lambda live: (live.stream.first_seen, live.server, live.stream.key)
+    ):
+        field = 2 * len(live.stream.name) + len(live.url) + len(live.server) + FIELD_OVERHEAD
+        if pages[-1] and (len(pages[-1]) == PAGE_FIELDS or size + field > PAGE_CHARS):
+            pages.append([])
+            size = 0
+        pages[-1].append(live)
+        size += field
+    return pages
+
+
+class ServerStatus:
+    """The last known status of one Broadcast Box server."""
+
+    __slots__ = ("url", "streams", "resp_status", "last_checked", "digest")
+
+    def __init__(self, url: str, streams: Dict[str, Stream], resp_status: int, last_checked: int):
+        self.url = url
+        self.streams = streams
+        self.resp_status = resp_status
+        self.last_checked = last_checked
+        self.digest = self._digest()
+
+    def _digest(self) -> str:
+        """Digest of everything the embed shows except the live-for clocks."""
+        shown = sorted((stream.key, stream.sessions) for stream in self.streams.values())
+        return hashlib.blake2b(
+            repr((self.url, self.resp_status, shown)).encode(), digest_size=16
+        ).hexdigest()
+
+    @classmethod
+    def from_dict(cls, url: str, data: Dict[str, Any]) -> "ServerStatus":
+        streams = (Stream.from_dict(stream) for stream in data["streams"])
+        return cls(
+            url,
+            {stream.key: stream for stream in streams},
+            data["resp_status"],
+            data["last_checked"],
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "streams": [stream.to_dict() for stream in self.streams.values()],
+            "resp_status": self.resp_status,
+            "last_checked": self.last_checked,
+        }
+
+
+class AggregateStatus:
+    """What a guild following several servers sees, their streams merged into one view.
+
+    `statuses` and `failing` line up with `servers`. A status is `None` for a
+    server that never answered, `failing` marks servers whose last check
+    failed, their last known streams are still shown. Views are immutable, a
+    new one is built when any of the servers changes.
+    """
+
+    __slots__ = ("servers", "statuses", "failing", "_pages", "_page_digests")
+
+    def __init__(
+        self,
+        servers: Tuple[Tuple[str, str], ...],
+        statuses: Tuple[Optional[ServerStatus], ...],
+        failing: Tuple[bool, ...],
+    ):
+        self.servers = servers
+        self.statuses = statuses
+        self.failing = failing
+        # Computed on first use, a view nobody renders is never paginated
+        self._pages: Optional[List[List[LiveStream]]] = None
+        self._page_digests: Optional[List[str]] = None
+
+    @property
+    def health(self) -> List[Tuple[str, Optional[bool]]]:
+        """Each server's name and whether it is healthy, `None` if it wasn't checked yet."""
+        health: List[Tuple[str, Optional[bool]]] = []
+        for (name, _url), status, failing in zip(self.servers, self.statuses, self.failing):
+            if failing or (status is not None and status.resp_status != 200):
+                health.append((name, False))
+            else:
+                health.append((name, None if status is None else True))
+        return health
+
+    @property
+    def pages(self) -> List[List[LiveStream]]:
+        """The streams shown on each page of the embed."""
+        if self._pages is None:
+            self._pages = paginate_streams(
+                LiveStream(name, url, stream)
+                for (name, url), status in zip(self.servers, self.statuses)
+                if status is not None
+                for stream in status.streams.values()
+            )
+        return self._pages
+
+    @property
+    def page_digests(self) -> List[str]:
+        """Digest of everything each page shows except the live-for clocks."""
+        if self._page_digests is None:
+            pages = self.pages
+            health = self.health
+            self._page_digests = [
+                hashlib.blake2b(
+                    repr(
+                        (
+                            health,
+                            index,
+                            len(pages),
+                            [(live.url, live.stream.key, live.stream.sessions) for live in page],
+                        )
+                    ).encode(),
+                    digest_size=16,
+                ).hexdigest()
+                for index, page in enumerate(pages)
+            ]
+        return self._page_digests
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import hmac
+import logging
+
+from aiohttp import web
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+__all__ = ["PushServer"]
+
+log = logging.getLogger("red.redbotcogs.broadcastboxlive.push")
+
+StatusHandler = Callable[[str, List[Dict[str, Any]]], Awaitable[bool]]
+EventHandler = Callable[[str, str, bool], Awaitable[bool]]
+
+
+class PushServer:
+    """A small HTTP server a Broadcast Box instance or a sidecar can push updates to.
+
+    - `POST /status` with `{"url": ..., "streams": [...]}`, where `streams` is
+      the body `/api/status` would return, replaces the status of `url`.
+    - `POST /event` with `{"url": ..., "streamKey": ..., "event": "start"|"stop"}`
+      marks a single stream as live or ended.
+
+    Requests need an `Authorization: Bearer <token>` header. Handlers return
+    `False` for servers no guild follows, which is answered with a 404, and
+    raise `ValueError` for malformed streams, answered with a 400.
+    """
+
+    def __init__(self, token: str, on_status: StatusHandler, on_event: EventHandler):
+        self.token = token
+        self.on_status = on_status
+        self.on_event = on_event
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None
+
+    async def start(self, host: str, port: int):
+        app = web.Application(client_max_size=1024 * 1024)
+        app.router.add_post("/status", self._status)
+        app.router.add_post("/event", self._event)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, host, port).start()
+        except OSError:
+            await runner.cleanup()
+            raise
+        self._runner = runner
+        log.info(f"Listening for pushed updates on {host}:{port}.")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _authorized(self, request: web.Request) -> bool:
+        header = request.headers.get("Authorization", "")
+        return hmac.compare_digest(header.encode(), f"Bearer {self.token}".encode())
+
+    async def _read(self, request: web.Request) -> Dict[str, Any]:
+        if not self._authorized(request):
+            raise web.HTTPUnauthorized()
+        try:
+            data = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="Body must be JSON.") from None
+        if not isinstance(data, dict) or not isinstance(data.get("url"), str):
+            raise web.HTTPBadRequest(text="Missing `url`.")
+        return data
+
+    async def _status(self, request: web.Request) -> web.Response:
+        data = await self._read(request)
+        streams = data.get("streams")
+        if not isinstance(streams, list):
+            raise web.HTTPBadRequest(text="`streams` must be a list of streams.")
+
+        # The handler raises `ValueError` for malformed streams before changing anything
+        try:
+            followed = await self.on_status(data["url"], streams)
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=f"Invalid `streams`: {e}") from None
+        if not followed:
+            raise web.HTTPNotFound(text="No guild follows this server.")
+        return web.Response(status=204)
+
+    async def _event(self, request: web.Request) -> web.Response:
+        data = await self._read(request)
+        key, event = data.get("streamKey"), data.get("event")
+        if not isinstance(key, str) or event not in ("start", "stop"):
+            raise web.HTTPBadRequest(text="Need a `streamKey` and an `event` of start or stop.")
+
+        if not await self.on_event(data["url"], key, event == "start"):
+            raise web.HTTPNotFound(text="No guild follows this server.")
+        return web.Response(status=204)
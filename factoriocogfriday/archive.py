@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import html
+import json
+import logging
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+__all__ = ["FFFPost", "FFFArchive", "parse_entry"]
+
+log = logging.getLogger("red.redbotcogs.factoriocogfriday.archive")
+
+FFF_ID_PATTERN = re.compile(rb"<id>https://www\.factorio\.com/blog/post/fff-(\d+)</id>")
+TITLE_PATTERN = re.compile(rb"<title[^>]*>(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?</title>", re.S)
+DATE_PATTERN = re.compile(rb"<(published|updated)>(\d{4}-\d{2}-\d{2})")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+ARCHIVE_VERSION = 1
+
+
+class FFFPost(NamedTuple):
+    """One Friday Facts post, `published` is an ISO date (YYYY-MM-DD) or empty."""
+
+    number: int
+    title: str
+    published: str
+
+
+def parse_entry(entry: bytes) -> Optional[FFFPost]:
+    """Parse a single Atom `<entry>`, `None` if it isn't an FFF post."""
+    found_id = FFF_ID_PATTERN.search(entry)
+    if found_id is None:
+        return None
+
+    found_title = TITLE_PATTERN.search(entry)
+    title = html.unescape(found_title.group(1).decode(errors="replace")) if found_title else ""
+    # Prefer when the post was published over when it was last edited
+    dates = {kind: date.decode() for kind, date in DATE_PATTERN.findall(entry)}
+    published = dates.get(b"published", dates.get(b"updated", ""))
+    return FFFPost(int(found_id.group(1)), " ".join(title.split()), published)
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class FFFArchive:
+    """Every FFF post seen in the feed, with an inverted index over the titles.
+
+    The feed only carries the most recent posts, so the archive grows from the
+    first time the cog reads it. On disk it is a JSON list of
+    `[number, title, published]` rows.
+    """
+
+    def __init__(self, posts: Iterable[FFFPost] = ()):
+        self.posts: Dict[int, FFFPost] = {}
+        # title token -> numbers of the posts whose title contains it
+        self.index: Dict[str, Set[int]] = {}
+        for post in posts:
+            self.add(post)
+
+    def __len__(self) -> int:
+        return len(self.posts)
+
+    def __contains__(self, number: int) -> bool:
+        return number in self.posts
+
+    def get(self, number: int) -> Optional[FFFPost]:
+        return self.posts.get(number)
+
+    @property
+    def latest(self) -> Optional[int]:
+        return max(self.posts, default=None)
+
+    def add(self, post: FFFPost) -> bool:
+        """Add or update a post, returns whether anything changed."""
+        previous = self.posts.get(post.number)
+        if previous == post:
+            return False
+
+        if previous is not None:
+            for token in tokenize(previous.title):
+                self.index[token].discard(post.number)
+        self.posts[post.number] = post
+        for token in tokenize(post.title):
+            self.index.setdefault(token, set()).add(post.number)
+        return True
+
+    def search(self, terms: str, limit: int = 10) -> List[FFFPost]:
+        """Posts whose title has every term, newest first.
+
+        The last term also matches as a prefix, so results show up while typing.
+        A number on its own also matches the post with that number.
+        """
+        tokens = tokenize(terms)
+        if not tokens:
+            return []
+
+        *whole, last = tokens
+        matches: Optional[Set[int]] = None
+        for token in whole:
+            numbers = self.index.get(token, set())
+            matches = set(numbers) if matches is None else matches & numbers
+        prefixed = {
+            number
+            for token, numbers in self.index.items()
+            if token.startswith(last)
+            for number in numbers
+        }
+        matches = prefixed if matches is None else matches & prefixed
+
+        if len(tokens) == 1 and last.isdigit() and int(last) in self.posts:
+            matches.add(int(last))
+        return [self.posts[number] for number in sorted(matches, reverse=True)[:limit]]
+
+    @classmethod
+    def load(cls, path: Path) -> "FFFArchive":
+        """Read an archive written by `save`, an empty one if there is none.
+
+        A corrupt archive is also replaced by an empty one, it's filled again
+        from the feed.
+        """
+        try:
+            with path.open(encoding="utf-8") as archive_file:
+                data = json.load(archive_file)
+        except FileNotFoundError:
+            return cls()
+        except ValueError as e:
+            log.warning(f"Couldn't read the FFF archive, starting a new one. Exception: {e!r}")
+            return cls()
+
+        if not isinstance(data, dict) or data.get("version") != ARCHIVE_VERSION:
+            return cls()
+        try:
+            return cls(
+                FFFPost(int(number), str(title), str(published))
+                for number, title, published in data["posts"]
+            )
+        except (ValueError, TypeError, KeyError) as e:
+            log.warning(f"Couldn't read the FFF archive, starting a new one. Exception: {e!r}")
+            return cls()
+
+    def rows(self) -> List[List[Any]]:
+        """A snapshot of the posts in the form `save` writes them."""
+        return [list(self.posts[number]) for number in sorted(self.posts)]
+
+    @staticmethod
+    def save(path: Path, rows: List[List[Any]]):
+        """Write `rows`, replacing the previous file only once fully written.
+
+        Takes a snapshot from `rows` so it can run in an executor while the
+        archive keeps changing.
+        """
+        tmp_path = path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as archive_file:
+            json.dump(
+                {"version": ARCHIVE_VERSION, "posts": rows},
+                archive_file,
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+        os.replace(tmp_path, path)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import math
+import time
+import random
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+__all__ = ["PollController", "parse_retry_after"]
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a `Retry-After` header, given in seconds or as an HTTP date.
+
+    `None` if the header is missing or isn't a finite delay.
+    """
+    if not value:
+        return None
+
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        return max(0.0, seconds) if math.isfinite(seconds) else None
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class PollController:
+    """Tracks the health of one upstream and decides when it may be polled again.
+
+    Each failure doubles the delay before the next attempt (with jitter), up to
+    `max_delay`. After `failure_threshold` consecutive failures the circuit
+    opens and the upstream is left alone for at least `open_delay`, after which
+    a single trial request is let through. A `Retry-After` from the upstream is
+    honoured up to the longest of those delays. Each success halves the failure count, so the delay
+    tightens back toward the normal interval instead of snapping back to it.
+    """
+
+    def __init__(
+        self,
+        base_delay: float = 60,
+        max_delay: float = 3600,
+        failure_threshold: int = 5,
+        open_delay: float = 900,
+    ):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.open_delay = open_delay
+        self.failures = 0
+        self.next_allowed = 0.0
+        # Outcome of the most recent request, `None` before the first one
+        self.last_ok: Optional[bool] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.failures >= self.failure_threshold
+
+    def allowed(self) -> bool:
+        return time.monotonic() >= self.next_allowed
+
+    def retry_in(self) -> float:
+        return max(0.0, self.next_allowed - time.monotonic())
+
+    def _delay(self) -> float:
+        if not self.failures:
+            return 0.0
+
+        delay = min(self.max_delay, self.base_delay * 2 ** (self.failures - 1))
+        delay = random.uniform(delay / 2, delay)
+        if self.is_open:
+            delay = max(delay, self.open_delay)
+        return delay
+
+    def record_success(self):
+        self.failures //= 2
+        self.last_ok = True
+        self.next_allowed = time.monotonic() + self._delay()
+
+    def record_failure(self, retry_after: Optional[float] = None):
+        self.failures += 1
+        self.last_ok = False
+        # A bogus header mustn't stop polling until the cog is reloaded
+        retry_after = min(retry_after or 0, max(self.max_delay, self.open_delay))
+        self.next_allowed = time.monotonic() + max(self._delay(), retry_after)
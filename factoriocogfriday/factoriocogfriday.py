@@ -1,16 +1,26 @@
 # -*- coding: utf-8 -*-
-import re
+import copy
 import time
+import sqlite3
+import asyncio
 import aiohttp
 import discord
 import logging
 
 # Remove Union when minimum python version is > 3.10
-from typing import Union, Optional, Dict, Any
+from typing import Union, Optional, Dict, Any, List, Set, Tuple, Callable, Awaitable
 from discord.ext import tasks
+from pathlib import Path
 from redbot.core import Config, commands, checks
+from redbot.core.data_manager import cog_data_path
 from redbot.core.i18n import Translator, cog_i18n
-from redbot.core.utils.chat_formatting import success, error, info
+from redbot.core.utils.chat_formatting import success, error, info, box, inline, pagify
+
+from .archive import FFFArchive, FFFPost, parse_entry
+from .backoff import PollController, parse_retry_after
+from .coordination import SharedCache
+from .metrics import Metrics, MetricsServer
+from .scheduler import GuildScheduler
 
 __all__ = ["UNIQUE_ID", "FactorioCogFriday"]
 
@@ -22,7 +32,29 @@ UNIQUE_ID = 0x10692DF0DC6C388
 FFF_RSS = "https://www.factorio.com/blog/rss"
 FFF_URL = "https://factorio.com/blog/post/fff-"
 
-fffnumREPat = re.compile(r"<id>https://www\.factorio\.com/blog/post/fff-(\d*)</id>")
+DEFAULT_GUILD = {"fff_info": {}, "channels": [], "interval": 6, "delivery": "bot", "webhooks": {}}
+WEBHOOK_NAME = "Factorio Cog Friday"
+
+# How old the cached FFF number may be when answering commands
+COMMAND_MAX_AGE = 60
+
+# Upper bound for the number of channels announced to at the same time
+ANNOUNCE_PARALLELISM = 10
+
+# Connection pool shared by every request the cog makes
+POOL_LIMIT = 10
+POOL_LIMIT_PER_HOST = 2
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 30
+
+# The feed is read in chunks until the first post already in the archive shows up
+FEED_CHUNK_SIZE = 4096
+MAX_FEED_BYTES = 512 * 1024
+ENTRY_START = b"<entry"
+ENTRY_END = b"</entry>"
+
+ARCHIVE_FILE = "fff_archive.json"
+SEARCH_RESULTS = 10
 
 
 @cog_i18n(_)
@@ -34,43 +66,373 @@ class FactorioCogFriday(commands.Cog):
             return False
         return True
 
-    async def _check_for_update(self, guild: discord.Guild, channel: int):
-        try:
-            fff_info = await self.conf.guild(guild).fff_info()
-            fff_sent_to_channel = fff_info.get(str(channel))
-            latest_fff = await self.conf.latest_fff()
-
-            if not fff_sent_to_channel or fff_sent_to_channel < latest_fff:
-                target_channel = self.bot.get_channel(channel)
-                if target_channel:
-                    await target_channel.send(
-                        _("New FFF! {fff_url}{number}").format(number=latest_fff, fff_url=FFF_URL)
+    def _guild_settings(self, guild_id: int) -> Dict[str, Any]:
+        """Cached settings of a guild, falling back to the registered defaults."""
+        return self.settings.get(guild_id, DEFAULT_GUILD)
+
+    def _cache_guild_setting(self, guild_id: int, key: str, value: Any):
+        # Copying the defaults only for a guild seen for the first time keeps this cheap
+        if guild_id not in self.settings:
+            self.settings[guild_id] = copy.deepcopy(DEFAULT_GUILD)
+        self.settings[guild_id][key] = value
+
+    async def _set_guild_setting(self, guild: discord.abc.Snowflake, key: str, value: Any):
+        """Write a guild setting through to Config and the in-memory cache.
+
+        The cache is updated first, so a caller copying the setting while
+        this write is in flight already sees the new value.
+        """
+        self._cache_guild_setting(guild.id, key, value)
+        await self.conf.guild(guild).set_raw(key, value=value)
+
+    def _index_channel(self, guild_id: int, channel: int, fff_num: int):
+        """Record the FFF number last delivered to a subscribed channel."""
+        self._unindex_channel(channel)
+        self.delivered[channel] = (guild_id, fff_num)
+        self.fff_index.setdefault(fff_num, set()).add(channel)
+
+    def _unindex_channel(self, channel: int):
+        self.parked.pop(channel, None)
+        if channel not in self.delivered:
+            return
+
+        fff_num = self.delivered.pop(channel)[1]
+        self.fff_index[fff_num].discard(channel)
+        if not self.fff_index[fff_num]:
+            del self.fff_index[fff_num]
+
+    def _park_channel(self, channel: int):
+        """Stop tracking a channel that can't be found until its guild is next due."""
+        guild_id, fff_num = self.delivered[channel]
+        self._unindex_channel(channel)
+        self.parked[channel] = (guild_id, fff_num)
+
+    def _unpark_channels(self, guild_id: int):
+        """Track the parked channels of a guild again, they're retried like any other."""
+        for channel, (parked_guild, fff_num) in list(self.parked.items()):
+            if parked_guild == guild_id:
+                self._index_channel(guild_id, channel, fff_num)
+
+    def _lagging_channels(self, latest_fff: int) -> List[int]:
+        """Channels that haven't received `latest_fff` yet."""
+        return [
+            channel
+            for fff_num, channels in self.fff_index.items()
+            if fff_num < latest_fff
+            for channel in channels
+        ]
+
+    async def _publish_update(self, guild: discord.Guild, channel: int):
+        """Send the latest FFF to a single channel and start tracking it."""
+        latest_fff = self.latest_fff or await self._latest_fff(COMMAND_MAX_AGE)
+        if latest_fff:
+            await self._send_announcement(guild, self.bot.get_channel(channel), latest_fff)
+            await self._save_delivered(guild.id, {channel: latest_fff})
+        self._index_channel(guild.id, channel, latest_fff or 0)
+
+    async def _announce(self, channels: List[int], fff_num: int):
+        """Send `fff_num` to every channel in `channels` concurrently."""
+        semaphore = asyncio.Semaphore(ANNOUNCE_PARALLELISM)
+        # Commands can unsubscribe channels while the sends are in flight
+        guild_ids = {channel: self.delivered[channel][0] for channel in channels}
+
+        async def send(channel: int) -> bool:
+            target_channel = self.bot.get_channel(channel)
+            if target_channel is None:
+                log.error(f"Channel {channel} not found.")
+                return False
+
+            guild = discord.Object(id=guild_ids[channel])
+            async with semaphore:
+                await self._send_announcement(guild, target_channel, fff_num)
+            return True
+
+        results = await asyncio.gather(
+            *(send(channel) for channel in channels), return_exceptions=True
+        )
+
+        sent: Dict[int, Dict[int, int]] = {}
+        for channel, result in zip(channels, results):
+            if isinstance(result, Exception):
+                self.metrics.inc("announcements", result="failed")
+                log.error(f"Error sending FFF {fff_num} to channel {channel}: {result!r}")
+            elif not result:
+                # A deleted channel, or one of a guild that is gone, would otherwise be
+                # retried every tick and keep the idle check from ever passing
+                if channel in self.delivered:
+                    self._park_channel(channel)
+            else:
+                self.metrics.inc("announcements", result="sent")
+                if channel not in self.delivered:
+                    continue
+                guild_id = guild_ids[channel]
+                sent.setdefault(guild_id, {})[channel] = fff_num
+                self._index_channel(guild_id, channel, fff_num)
+
+        # One write per guild, however many of its channels were announced to
+        for guild_id, delivered in sent.items():
+            await self._save_delivered(guild_id, delivered)
+
+    async def _send_announcement(
+        self, guild: discord.abc.Snowflake, channel: discord.TextChannel, fff_num: int
+    ):
+        content = _("New FFF! {post}").format(post=self._format_post(fff_num))
+        if self._guild_settings(guild.id)["delivery"] == "webhook":
+            webhook = await self._get_webhook(guild, channel)
+            if webhook is not None:
+                try:
+                    self.metrics.inc("discord_requests", action="webhook_send")
+                    await webhook.send(
+                        content,
+                        username=self.bot.user.display_name,
+                        avatar_url=self.bot.user.display_avatar.url,
                     )
-                    fff_info[str(channel)] = latest_fff
-                else:
-                    log.error(f"Channel {channel} not found in guild {guild.name}.")
+                    return
+                except discord.errors.NotFound:
+                    log.warning(f"Webhook for {channel.id} was deleted, sending as the bot.")
+                    await self._forget_webhook(guild, channel.id)
+
+        self.metrics.inc("discord_requests", action="send")
+        await channel.send(content)
+
+    def _format_post(self, fff_num: int) -> str:
+        """The post's title and date when it's archived, followed by its link."""
+        post = self.archive.get(fff_num)
+        if post is None or not post.title:
+            return f"{FFF_URL}{fff_num}"
+        published = f" ({post.published})" if post.published else ""
+        return f"**{post.title}**{published}\n{FFF_URL}{fff_num}"
+
+    async def _get_webhook(
+        self, guild: discord.abc.Snowflake, channel: discord.TextChannel
+    ) -> Optional[discord.Webhook]:
+        """The webhook used to deliver to `channel`, found or created on first use.
+
+        Webhooks are bound to the cog's session so their requests share its pool.
+        """
+        if channel.id in self.webhooks:
+            return self.webhooks[channel.id]
+
+        webhooks = dict(self._guild_settings(guild.id)["webhooks"])
+        url = webhooks.get(str(channel.id))
+        if url is None:
+            try:
+                url = await self._create_webhook(channel)
+            except discord.errors.Forbidden:
+                log.warning(
+                    f"No permission to manage webhooks in {channel.id}, sending as the bot."
+                )
+                self.webhooks[channel.id] = None
+                return None
+
+            webhooks[str(channel.id)] = url
+            await self._set_guild_setting(guild, "webhooks", webhooks)
+
+        webhook = discord.Webhook.from_url(url, session=self.session)
+        self.webhooks[channel.id] = webhook
+        return webhook
+
+    async def _create_webhook(self, channel: discord.TextChannel) -> str:
+        for webhook in await channel.webhooks():
+            if webhook.user == self.bot.user and webhook.name == WEBHOOK_NAME and webhook.token:
+                return webhook.url
+        return (await channel.create_webhook(name=WEBHOOK_NAME)).url
+
+    async def _forget_webhook(self, guild: discord.abc.Snowflake, channel: int):
+        self.webhooks.pop(channel, None)
+        webhooks = dict(self._guild_settings(guild.id)["webhooks"])
+        if webhooks.pop(str(channel), None) is not None:
+            await self._set_guild_setting(guild, "webhooks", webhooks)
+
+    async def _save_delivered(self, guild_id: int, delivered: Dict[int, int]):
+        fff_info = dict(self._guild_settings(guild_id)["fff_info"])
+        fff_info.update({str(channel): fff_num for channel, fff_num in delivered.items()})
+        await self._set_guild_setting(discord.Object(id=guild_id), "fff_info", fff_info)
+
+    async def _read_new_posts(self, resp: aiohttp.ClientResponse) -> List[FFFPost]:
+        """Stream the feed, newest first, and stop at the first post already archived."""
+        known = self.archive.latest or 0
+        posts: List[FFFPost] = []
+        buffer = b""
+        read = 0
+        async for chunk in resp.content.iter_chunked(FEED_CHUNK_SIZE):
+            read += len(chunk)
+            buffer += chunk
+            end = buffer.find(ENTRY_END)
+            while end != -1:
+                # Skip the feed's own header in front of the first entry
+                start = buffer.rfind(ENTRY_START, 0, end)
+                post = parse_entry(buffer[max(start, 0) : end])
+                buffer = buffer[end + len(ENTRY_END) :]
+                if post is not None:
+                    if post.number <= known:
+                        return posts
+                    posts.append(post)
+                end = buffer.find(ENTRY_END)
+
+            if read >= MAX_FEED_BYTES:
+                log.warning(f"Stopped reading the feed after {read} bytes.")
+                break
+        return posts
+
+    async def _save_archive(self):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                None, FFFArchive.save, self.archive_path, self.archive.rows()
+            )
+        except OSError as e:
+            log.error(f"Error saving the FFF archive: {e!r}")
+
+    async def _single_flight(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `factory` once for all concurrent callers using the same `key`."""
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self.inflight[key] = task
+            task.add_done_callback(lambda _task: self.inflight.pop(key, None))
+        else:
+            self.metrics.inc("shared_requests")
+        # A cancelled caller mustn't cancel the request the others are waiting on
+        return await asyncio.shield(task)
+
+    async def _latest_fff(self, max_age: float) -> Union[int, None]:
+        """The latest FFF number, fetched if the cached one is older than `max_age` seconds.
+
+        The cached number is still returned while the feed fails or is backed off.
+        """
+        if self.latest_fff and not self._check_timeout(self.last_checked, max_age):
+            self.metrics.inc("feed_cache", result="hit")
+            return self.latest_fff
+        self.metrics.inc("feed_cache", result="miss")
+        fff_num = await self._single_flight(FFF_RSS, lambda: self._refresh_latest_fff(max_age))
+        return fff_num or self.latest_fff
+
+    async def _refresh_latest_fff(self, max_age: float) -> Union[int, None]:
+        if self.coordinator is not None:
+            try:
+                shared = await self.coordinator.read(FFF_RSS)
+                # Whoever is due first polls for everyone, the lease lasts as long as its
+                # result stays fresh so nobody else polls within the same window
+                fresh = shared is not None and not self._check_timeout(shared[1], max_age)
+                leader = not fresh and await self.coordinator.acquire(FFF_RSS, max_age)
+            except sqlite3.Error as e:
+                log.warning(f"Coordination unavailable, polling directly. Exception: {e!r}")
             else:
-                log.debug(f"No new FFF to send to channel {channel} in guild {guild.name}.")
-
-            await self.conf.guild(guild).fff_info.set(fff_info)
-        except Exception as e:
-            log.error(f"An error occurred during FFF update check: {e}")
+                if not leader:
+                    return await self._read_shared_fff(shared)
+
+        fff_num = await self._get_latest_fff_number()
+        if fff_num:
+            self.last_checked = int(time.time())
+            await self.conf.last_checked.set(self.last_checked)
+            if self.coordinator is not None:
+                try:
+                    await self.coordinator.publish(
+                        FFF_RSS, {"latest_fff": fff_num, "posts": self.archive.rows()}
+                    )
+                except sqlite3.Error as e:
+                    log.warning(f"Couldn't share the latest FFF. Exception: {e!r}")
+        return fff_num
+
+    async def _read_shared_fff(self, shared: Optional[Tuple[Any, float]]) -> Union[int, None]:
+        """Take the latest FFF and archive from the bot process polling the feed."""
+        if shared is None:
+            return self.latest_fff
+
+        self.metrics.inc("shared_feeds")
+        data, updated = shared
+        changed = False
+        for row in data["posts"]:
+            changed |= self.archive.add(FFFPost(*row))
+        if changed:
+            await self._save_archive()
+
+        if data["latest_fff"] != self.latest_fff:
+            self.latest_fff = data["latest_fff"]
+            await self.conf.latest_fff.set(self.latest_fff)
+        self.last_checked = int(updated)
+        await self.conf.last_checked.set(self.last_checked)
+        return self.latest_fff
 
     async def _get_latest_fff_number(self) -> Union[int, None]:
+        """The latest FFF number from the feed, `None` if it wasn't fetched.
+
+        That is while the feed is backed off or when the request fails, so
+        callers never mistake the cached number for a fresh poll.
+        """
+        headers = {}
+        latest_fff = self.latest_fff
+
+        if not self.feed_controller.allowed():
+            log.debug(
+                f"Backing off the FFF feed for {self.feed_controller.retry_in():.0f} seconds."
+            )
+            self.metrics.inc("fetches", result="backoff")
+            return None
+        # Only revalidate when there is a cached number and archive to fall back on
+        if latest_fff and self.archive:
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+
+        started = time.perf_counter()
         try:
-            async with aiohttp.ClientSession() as client:
-                async with client.get(FFF_RSS) as resp:
-                    if resp.status == 200:
-                        text = await resp.text()
-                        found_fff_num = re.search(fffnumREPat, text)
-                        if found_fff_num:
-                            return int(found_fff_num.group(1))
-                        else:
-                            log.error("Error finding FFF number.")
+            async with self.session.get(
+                FFF_RSS, headers=headers, timeout=self.client_timeout
+            ) as resp:
+                self.metrics.inc("fetches", result=resp.status)
+                if resp.status == 304:
+                    log.debug("FFF feed not modified.")
+                    self.feed_controller.record_success()
+                    return latest_fff
+                elif resp.status == 200:
+                    posts = await self._read_new_posts(resp)
+                    if posts:
+                        for post in posts:
+                            self.archive.add(post)
+                        await self._save_archive()
+                    fff_num = self.archive.latest
+                    if fff_num:
+                        self.feed_controller.record_success()
+                        # Keep the validators and the number they describe in sync,
+                        # writing only the ones that changed
+                        if fff_num != self.latest_fff:
+                            self.latest_fff = fff_num
+                            await self.conf.latest_fff.set(fff_num)
+                        etag = resp.headers.get("ETag")
+                        if etag != self.etag:
+                            self.etag = etag
+                            await self.conf.etag.set(etag)
+                        last_modified = resp.headers.get("Last-Modified")
+                        if last_modified != self.last_modified:
+                            self.last_modified = last_modified
+                            await self.conf.last_modified.set(last_modified)
+                        return fff_num
                     else:
-                        log.error(f"Error getting latest FFF number. Status code: {resp.status}")
-        except aiohttp.ClientError as e:
-            log.error(f"Error during HTTP request: {e}")
+                        self.feed_controller.record_failure()
+                        self.metrics.inc("fetch_failures")
+                        log.error("Error finding FFF number.")
+                elif resp.status in (429, 503):
+                    retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                    self.feed_controller.record_failure(retry_after)
+                    self.metrics.inc("fetch_failures")
+                    log.warning(
+                        f"factorio.com asked us to slow down ({resp.status}),"
+                        f" retrying in {self.feed_controller.retry_in():.0f} seconds."
+                    )
+                else:
+                    self.feed_controller.record_failure()
+                    self.metrics.inc("fetch_failures")
+                    log.error(f"Error getting latest FFF number. Status code: {resp.status}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.feed_controller.record_failure()
+            self.metrics.inc("fetches", result="error")
+            self.metrics.inc("fetch_failures")
+            log.error(f"Error during HTTP request: {e!r}")
+        finally:
+            self.metrics.observe("fetch_seconds", time.perf_counter() - started)
         return None
 
     async def _manage_channel(
@@ -113,11 +475,19 @@ class FactorioCogFriday(commands.Cog):
                             await ctx.send(error(_("Error: {error}").format(error=e)))
                         else:
                             channels.append(target_channel.id)
+                            self._cache_guild_setting(ctx.guild.id, "channels", list(channels))
+                            if ctx.guild.id not in self.scheduler:
+                                self.scheduler.schedule(
+                                    ctx.guild.id,
+                                    self._guild_settings(ctx.guild.id)["interval"] * 3600,
+                                    jitter=True,
+                                )
                             await ctx.send(
                                 success(
                                     _(
                                         "Added {channel} to the list of channels receiving FFFs."
-                                        " To remove this channel, use `{prefix}bbl remove {channel}`."
+                                        " To remove this channel,"
+                                        " use `{prefix}fcf remove {channel}`."
                                     ).format(channel=target_channel.mention, prefix=ctx.prefix)
                                 )
                             )
@@ -125,6 +495,10 @@ class FactorioCogFriday(commands.Cog):
                 elif action == "remove":
                     if target_channel.id in channels:
                         channels.remove(target_channel.id)
+                        self._cache_guild_setting(ctx.guild.id, "channels", list(channels))
+                        self._unindex_channel(target_channel.id)
+                        if not channels:
+                            self.scheduler.remove(ctx.guild.id)
                         await ctx.send(
                             success(
                                 _(
@@ -144,10 +518,137 @@ class FactorioCogFriday(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.conf = Config.get_conf(self, identifier=UNIQUE_ID, force_registration=True)
-        self.conf.register_guild(fff_info={}, channels=[], interval=6)
-        self.conf.register_global(latest_fff=None, last_checked=None, timeout=600)
+        self.conf.register_guild(**DEFAULT_GUILD)
+        self.conf.register_global(
+            latest_fff=None,
+            last_checked=None,
+            timeout=600,
+            connect_timeout=10,
+            read_timeout=30,
+            etag=None,
+            last_modified=None,
+            metrics_port=None,
+            metrics_host="127.0.0.1",
+            coordination_path=None,
+        )
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.client_timeout: Optional[aiohttp.ClientTimeout] = None
+        # Background loop reads settings from memory, commands write through to Config
+        self.settings: Dict[int, Dict[str, Any]] = {}
+        self.latest_fff: Optional[int] = None
+        self.last_checked: Optional[int] = None
+        # Validators of the last feed response, sent to revalidate it
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.feed_timeout = 600
+        self.scheduler = GuildScheduler()
+        # key -> request shared by every concurrent caller
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.feed_controller = PollController(base_delay=600, max_delay=21600, open_delay=3600)
+        # channel ID -> (guild ID, FFF number last delivered to it), and the
+        # reverse index of FFF number -> channel IDs used to find lagging channels
+        self.delivered: Dict[int, Tuple[int, int]] = {}
+        self.fff_index: Dict[int, Set[int]] = {}
+        # channel ID -> (guild ID, FFF number last delivered to it) of channels that
+        # couldn't be found, left out of the index until their guild is next due
+        self.parked: Dict[int, Tuple[int, int]] = {}
+        # channel ID -> webhook used for delivery, `None` if one can't be created
+        self.webhooks: Dict[int, Optional[discord.Webhook]] = {}
+        self.metrics = Metrics("factoriocogfriday")
+        self.archive = FFFArchive()
+        self.archive_path: Optional[Path] = None
+        self.coordinator: Optional[SharedCache] = None
+        self.metrics_server: Optional[MetricsServer] = None
+
+    async def cog_load(self):
+        self.archive_path = cog_data_path(self) / ARCHIVE_FILE
+        self.archive = await asyncio.get_running_loop().run_in_executor(
+            None, FFFArchive.load, self.archive_path
+        )
+        self.settings = await self.conf.all_guilds()
+        self.latest_fff = await self.conf.latest_fff()
+        self.last_checked = await self.conf.last_checked()
+        self.etag = await self.conf.etag()
+        self.last_modified = await self.conf.last_modified()
+        self.feed_timeout = await self.conf.timeout()
+        for guild_id, guild_data in self.settings.items():
+            for channel in guild_data["channels"]:
+                self._index_channel(
+                    guild_id, channel, guild_data["fff_info"].get(str(channel)) or 0
+                )
+            if guild_data["channels"]:
+                self.scheduler.schedule(guild_id, guild_data["interval"] * 3600, jitter=True)
+        self.client_timeout = await self._build_timeout()
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=POOL_LIMIT,
+                limit_per_host=POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ),
+            timeout=self.client_timeout,
+        )
+        try:
+            await self._start_metrics_server()
+        except OSError as e:
+            log.error(f"Couldn't start the metrics server. Exception: {e!r}")
+        path = await self.conf.coordination_path()
+        if path is not None:
+            try:
+                await self._start_coordination(Path(path))
+            except (sqlite3.Error, OSError) as e:
+                log.error(f"Couldn't open {path}, polling without coordination. Exception: {e!r}")
         self.background_check_for_update.start()
 
+    async def _start_metrics_server(self):
+        """(Re)start the Prometheus endpoint on the configured port, if there is one."""
+        await self._stop_metrics_server()
+        port = await self.conf.metrics_port()
+        if port is None:
+            return
+
+        server = MetricsServer(self.metrics, self._collect_metrics)
+        await server.start(await self.conf.metrics_host(), port)
+        self.metrics_server = server
+
+    async def _stop_metrics_server(self):
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+            self.metrics_server = None
+
+    def _collect_metrics(self):
+        """Refresh the gauges that are only computed when metrics are read."""
+        if self.last_checked:
+            self.metrics.set("feed_age_seconds", time.time() - self.last_checked)
+        if self.latest_fff:
+            self.metrics.set("latest_fff", self.latest_fff)
+            self.metrics.set("lagging_channels", len(self._lagging_channels(self.latest_fff)))
+        self.metrics.set("subscribed_channels", len(self.delivered) + len(self.parked))
+        self.metrics.set("scheduled_guilds", len(self.scheduler))
+
+    async def _start_coordination(self, path: Path):
+        await self._stop_coordination()
+        coordinator = SharedCache(path)
+        await coordinator.setup()
+        self.coordinator = coordinator
+
+    async def _stop_coordination(self):
+        """Hand the feed over to the other processes right away if this one polls it."""
+        if self.coordinator is None:
+            return
+
+        coordinator, self.coordinator = self.coordinator, None
+        try:
+            await coordinator.release_all()
+        except sqlite3.Error as e:
+            log.warning(f"Couldn't release the polling lease. Exception: {e!r}")
+
+    async def _build_timeout(self) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(
+            connect=await self.conf.connect_timeout(),
+            sock_read=await self.conf.read_timeout(),
+        )
+
     async def red_delete_data_for_user(self, *args, **kwargs) -> None:
         """Nothing to delete."""
         return
@@ -159,25 +660,33 @@ class FactorioCogFriday(commands.Cog):
     async def init_loop(self):
         await self.bot.wait_until_ready()
 
-    @tasks.loop(hours=6)
+    @tasks.loop(seconds=0)
     async def background_check_for_update(self):
-        last_checked = await self.conf.last_checked()
-        timeout = await self.conf.timeout()
+        # Sleep until the next guild is due, each guild runs on its own interval
+        due = await self.scheduler.wait_due()
+        with self.metrics.timer("tick_seconds"):
+            guilds = []
+            for guild_id in due:
+                guild = self.bot.get_guild(guild_id)
+                settings = self._guild_settings(guild_id)
+                if not settings["channels"]:
+                    continue
+
+                # A guild missing during an outage is tried again on its next turn
+                self.scheduler.schedule(guild_id, settings["interval"] * 3600)
+                if guild is not None:
+                    guilds.append(guild)
+                    self._unpark_channels(guild_id)
+
+            if guilds:
+                await self._latest_fff(self.feed_timeout)
+
+            # Nothing to visit unless some channel is behind the latest FFF
+            latest_fff = self.latest_fff
+            if not latest_fff or not self.fff_index or min(self.fff_index) >= latest_fff:
+                return
 
-        if self._check_timeout(last_checked, timeout):
-            fff_num = await self._get_latest_fff_number()
-            if fff_num:
-                await self.conf.latest_fff.set(fff_num)
-                await self.conf.last_checked.set(int(time.time()))
-
-        for guild in self.bot.guilds:
-            channels = await self.conf.guild(guild).channels()
-            for channel_id in channels:
-                channel = self.bot.get_channel(channel_id)
-                if channel:
-                    await self._check_for_update(guild, channel)
-                else:
-                    log.error(f"Channel {channel_id} not found in guild {guild.name}.")
+            await self._announce(self._lagging_channels(latest_fff), latest_fff)
 
     @background_check_for_update.before_loop
     async def wait_for_red(self):
@@ -185,6 +694,10 @@ class FactorioCogFriday(commands.Cog):
 
     async def cog_unload(self):
         self.background_check_for_update.cancel()
+        await self._stop_metrics_server()
+        await self._stop_coordination()
+        if self.session is not None:
+            await self.session.close()
 
     @commands.group()
     async def fcf(self, ctx: commands.Context):
@@ -197,16 +710,16 @@ class FactorioCogFriday(commands.Cog):
         """
         Set the interval in hours at which to check for updates.
 
-        Default is 6 hours
+        Each server has its own interval. Default is 6 hours
         Please be nice to the Factorio devs ❤️
         """
 
         if ctx.author.bot:
             return
 
-        async with ctx.trigger_typing():
+        async with ctx.typing():
             if interval is None:
-                interval = await self.conf.guild(ctx.guild).interval()
+                interval = self._guild_settings(ctx.guild.id)["interval"]
                 await ctx.send(
                     info(_("Currently checking every {number} hours.").format(number=interval))
                 )
@@ -218,32 +731,254 @@ class FactorioCogFriday(commands.Cog):
                 await ctx.send(error(_("You cannot set the interval greater than 8760 hours.")))
                 return
 
-            await self.conf.guild(ctx.guild).interval.set(interval)
-            self.background_check_for_update.change_interval(hours=interval)
+            await self._set_guild_setting(ctx.guild, "interval", interval)
+            if ctx.guild.id in self.scheduler:
+                self.scheduler.schedule(ctx.guild.id, interval * 3600, jitter=True)
             await ctx.send(
                 success(
                     _("Now checking every {number} hours for a new FFF.").format(number=interval)
                 )
             )
 
+    @checks.is_owner()
+    @fcf.command(name="httptimeout", usage="Optional[connect] Optional[read]")
+    async def httpTimeout(
+        self, ctx: commands.Context, connect: Optional[float] = None, read: Optional[float] = None
+    ):
+        """
+        Set the connect and read timeouts in seconds for requests to factorio.com.
+
+        Applies to every guild. Default is 10 seconds to connect and 30 seconds to read.
+        """
+
+        if connect is None:
+            await ctx.send(
+                info(
+                    _("Current timeouts: {connect}s to connect, {read}s to read.").format(
+                        connect=await self.conf.connect_timeout(),
+                        read=await self.conf.read_timeout(),
+                    )
+                )
+            )
+            return
+
+        if read is None:
+            read = await self.conf.read_timeout()
+
+        if connect <= 0 or read <= 0:
+            await ctx.send(error(_("Timeouts must be greater than 0 seconds.")))
+            return
+
+        await self.conf.connect_timeout.set(connect)
+        await self.conf.read_timeout.set(read)
+        self.client_timeout = await self._build_timeout()
+        await ctx.send(
+            success(
+                _("Timeouts set to {connect}s to connect and {read}s to read.").format(
+                    connect=connect, read=read
+                )
+            )
+        )
+
+    @checks.admin_or_permissions(manage_guild=True)
+    @commands.guild_only()
+    @fcf.command(usage="Optional[bot|webhook]")
+    async def delivery(self, ctx: commands.Context, mode: Optional[str] = None):
+        """
+        Choose whether FFFs are sent as the bot or through a webhook.
+
+        Webhooks have their own rate limits, so announcements to many channels
+        don't compete with the bot's commands. They need the Manage Webhooks
+        permission, without it FFFs are sent as the bot.
+        """
+
+        if ctx.author.bot:
+            return
+
+        settings = self._guild_settings(ctx.guild.id)
+        if mode is None:
+            await ctx.send(
+                info(_("Currently sending FFFs as {mode}.").format(mode=settings["delivery"]))
+            )
+            return
+
+        mode = mode.lower()
+        if mode not in ("bot", "webhook"):
+            await ctx.send(error(_("Delivery must be either `bot` or `webhook`.")))
+            return
+
+        if mode == "webhook":
+            # Retry channels where creating a webhook failed before
+            for channel in settings["channels"]:
+                if channel in self.webhooks and self.webhooks[channel] is None:
+                    del self.webhooks[channel]
+
+        await self._set_guild_setting(ctx.guild, "delivery", mode)
+        await ctx.send(success(_("Now sending FFFs as {mode}.").format(mode=mode)))
+
     @commands.cooldown(1, 5, commands.BucketType.guild)
     @fcf.command(usage="Optional[number]")
     async def fff(self, ctx: commands.Context, number: Optional[int] = None):
         """
         Links the latest FFF or the specific FFF if a number is provided.
+
+        FFFs in the local archive are shown with their title and date.
         """
 
-        async with ctx.trigger_typing():
-            if number is not None:
-                await ctx.send(info(_("{fff_url}{number}").format(fff_url=FFF_URL, number=number)))
+        if number is not None:
+            # Numbers past the newest known post can't exist yet, older ones may
+            # predate the archive and are linked without a title
+            latest = self.archive.latest or self.latest_fff
+            if number < 1 or (latest and number > latest):
+                await ctx.send(error(_("FFF #{number} doesn't exist yet.").format(number=number)))
             else:
-                fff_num = await self._get_latest_fff_number()
-                if fff_num:
-                    await ctx.send(
-                        info(_("{fff_url}{number}").format(fff_url=FFF_URL, number=fff_num))
+                await ctx.send(info(self._format_post(number)))
+            return
+
+        async with ctx.typing():
+            fff_num = await self._latest_fff(COMMAND_MAX_AGE)
+            if fff_num:
+                await ctx.send(info(self._format_post(fff_num)))
+            else:
+                await ctx.send(error(_("Error finding FFF number.")))
+
+    @commands.cooldown(1, 5, commands.BucketType.user)
+    @fcf.command()
+    async def search(self, ctx: commands.Context, *, terms: str):
+        """
+        Search the titles of archived FFFs, newest first.
+
+        The archive holds every FFF seen in the feed since the cog was installed.
+        """
+
+        posts = self.archive.search(terms, SEARCH_RESULTS)
+        if not posts:
+            await ctx.send(info(_("No FFF titles match {terms}.").format(terms=inline(terms))))
+            return
+
+        lines = []
+        for post in posts:
+            published = f" ({post.published})" if post.published else ""
+            title = post.title or f"FFF #{post.number}"
+            lines.append(f"**{title}**{published} <{FFF_URL}{post.number}>")
+        await ctx.send("\n".join(lines))
+
+    @checks.is_owner()
+    @fcf.command()
+    async def stats(self, ctx: commands.Context):
+        """
+        Show counters and timings collected since the cog was loaded.
+
+        Timings are in seconds, percentiles are the upper bound of their bucket.
+        """
+
+        self._collect_metrics()
+        uptime = int(time.time() - self.metrics.started)
+        lines = [_("Collected over {seconds} seconds.").format(seconds=uptime)]
+        hits = self.metrics.counter("feed_cache", result="hit")
+        lookups = self.metrics.counter("feed_cache")
+        if lookups:
+            lines.append(_("Feed cache hit rate: {rate:.1%}").format(rate=hits / lookups))
+        lines.append("")
+        lines.extend(self.metrics.summary())
+        for page in pagify("\n".join(lines), page_length=1900):
+            await ctx.send(box(page))
+
+    @checks.is_owner()
+    @fcf.command(usage="Optional[port|off] Optional[host]")
+    async def prometheus(
+        self, ctx: commands.Context, port: Optional[str] = None, host: Optional[str] = None
+    ):
+        """
+        Serve the collected metrics for Prometheus on `http://host:port/metrics`.
+
+        Listens on `host`, 127.0.0.1 by default. Use `off` to stop serving them.
+        """
+
+        if port is None:
+            if self.metrics_server is None:
+                await ctx.send(info(_("Not serving metrics.")))
+            else:
+                await ctx.send(
+                    info(
+                        _("Serving metrics on {host}:{port}.").format(
+                            host=await self.conf.metrics_host(),
+                            port=await self.conf.metrics_port(),
+                        )
                     )
-                else:
-                    await ctx.send(error(_("Error finding FFF number.")))
+                )
+            return
+
+        if port.lower() == "off":
+            await self.conf.metrics_port.set(None)
+            await self._stop_metrics_server()
+            await ctx.send(success(_("Stopped serving metrics.")))
+            return
+
+        if not port.isdigit() or not 1 <= int(port) <= 65535:
+            await ctx.send(error(_("The port must be a number between 1 and 65535.")))
+            return
+
+        await self.conf.metrics_port.set(int(port))
+        if host is not None:
+            await self.conf.metrics_host.set(host)
+        try:
+            await self._start_metrics_server()
+        except OSError as e:
+            await self.conf.metrics_port.set(None)
+            await ctx.send(
+                error(_("Couldn't start the metrics server: {error}").format(error=e.strerror))
+            )
+            return
+
+        await ctx.send(
+            success(
+                _("Serving metrics on {host}:{port}.").format(
+                    host=await self.conf.metrics_host(), port=port
+                )
+            )
+        )
+
+    @checks.is_owner()
+    @fcf.command(usage="Optional[path|off]")
+    async def coordinate(self, ctx: commands.Context, *, path: Optional[str] = None):
+        """
+        Share polling with the other bots on this machine through a SQLite file.
+
+        Give every bot the same `path`. One of them polls factorio.com and the
+        others reuse its result. If that bot stops, another one takes over
+        once its last result is older than the feed timeout. The same file
+        can be used for BroadcastBoxLive.
+
+        Use `off` to poll on this bot's own again.
+        """
+
+        if path is None:
+            current = await self.conf.coordination_path()
+            if current is None:
+                await ctx.send(info(_("Polling without coordination.")))
+            else:
+                await ctx.send(
+                    info(_("Coordinating through {path}.").format(path=inline(current)))
+                )
+            return
+
+        if path.lower() == "off":
+            await self.conf.coordination_path.set(None)
+            await self._stop_coordination()
+            await ctx.send(success(_("Now polling without coordination.")))
+            return
+
+        try:
+            await self._start_coordination(Path(path).expanduser())
+        except (sqlite3.Error, OSError) as e:
+            await ctx.send(
+                error(_("Couldn't use {path}: {error}").format(path=inline(path), error=e))
+            )
+            return
+
+        await self.conf.coordination_path.set(str(Path(path).expanduser()))
+        await ctx.send(success(_("Now coordinating through {path}.").format(path=inline(path))))
 
     @checks.admin_or_permissions(manage_guild=True)
     @commands.guild_only()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import time
+import heapq
+import random
+import asyncio
+
+from typing import Dict, List, Tuple
+
+__all__ = ["GuildScheduler"]
+
+
+class GuildScheduler:
+    """A heap of guild IDs ordered by the time they are next due.
+
+    Every guild keeps its own interval. Rescheduling or removing a guild
+    leaves its old heap entry behind, stale entries are skipped when popped.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int]] = []
+        self._due: Dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._due
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def schedule(self, guild_id: int, interval: float, jitter: bool = False):
+        """Schedule a guild `interval` seconds from now.
+
+        With `jitter` the guild is instead placed at a random point within the
+        next `interval`, which spreads guilds sharing an interval over the period.
+        """
+        delay = random.uniform(0, interval) if jitter else interval
+        due = time.monotonic() + delay
+        self._due[guild_id] = due
+        heapq.heappush(self._heap, (due, guild_id))
+        self._wakeup.set()
+
+    def remove(self, guild_id: int):
+        self._due.pop(guild_id, None)
+
+    def _drop_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def pop_due(self) -> List[int]:
+        """Remove and return every guild that is due now."""
+        now = time.monotonic()
+        due = []
+        self._drop_stale()
+        while self._heap and self._heap[0][0] <= now:
+            _, guild_id = heapq.heappop(self._heap)
+            del self._due[guild_id]
+            due.append(guild_id)
+            self._drop_stale()
+        return due
+
+    async def wait_due(self) -> List[int]:
+        """Sleep until at least one guild is due, then pop every due guild."""
+        while True:
+            due = self.pop_due()
+            if due:
+                return due
+
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import types
+
+import pytest
+
+from factoriocogfriday.archive import FFFArchive, FFFPost, parse_entry
+from factoriocogfriday.factoriocogfriday import FactorioCogFriday
+
+
+def entry(number, title="Friday Facts", published="2024-03-01", kind="fff"):
+    url = f"https://www.factorio.com/blog/post/{kind}-{number}"
+    return (
+        f'<entry><title type="html">{title}</title><link href="{url}"/>'
+        f"<published>{published}T12:00:00+00:00</published><id>{url}</id></entry>"
+    ).encode()
+
+
+def test_parse_entry():
+    post = parse_entry(entry(400, "Friday Facts #400 -  Trains &amp; belts"))
+    assert post == FFFPost(400, "Friday Facts #400 - Trains & belts", "2024-03-01")
+
+
+def test_parse_entry_prefers_published_over_updated():
+    body = b"<updated>2024-05-01</updated><published>2024-04-01</published>"
+    assert parse_entry(entry(1).replace(b"</entry>", body)).published == "2024-04-01"
+
+
+def test_parse_entry_skips_other_posts():
+    assert parse_entry(entry(12, kind="news")) is None
+
+
+@pytest.fixture
+def archive():
+    return FFFArchive(
+        [
+            FFFPost(1, "Trains and belts", ""),
+            FFFPost(2, "Space Age", ""),
+            FFFPost(3, "Quality of trains", ""),
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "terms, expected",
+    [("trains", [3, 1]), ("tra", [3, 1]), ("quality tra", [3]), ("qual trains", []), ("2", [2])],
+)
+def test_search(archive, terms, expected):
+    assert [post.number for post in archive.search(terms)] == expected
+
+
+def test_search_limit(archive):
+    assert [post.number for post in archive.search("t", limit=1)] == [3]
+
+
+def test_add_reindexes_changed_titles(archive):
+    assert archive.add(FFFPost(2, "Space Age", "")) is False
+    assert archive.add(FFFPost(2, "Elevated rails", ""))
+    assert archive.search("space") == []
+    assert [post.number for post in archive.search("rails")] == [2]
+
+
+def test_save_and_load(tmp_path, archive):
+    path = tmp_path / "archive.json"
+    FFFArchive.save(path, archive.rows())
+    assert FFFArchive.load(path).rows() == archive.rows()
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "{",
+        "[]",
+        '{"version": 1}',
+        '{"version": 1, "posts": [[1, "a"]]}',
+        '{"version": 1, "posts": [["one", "a", ""]]}',
+        '{"version": 1, "posts": 5}',
+    ],
+)
+def test_load_corrupt_archive(tmp_path, content):
+    path = tmp_path / "archive.json"
+    path.write_text(content, encoding="utf-8")
+    assert len(FFFArchive.load(path)) == 0
+
+
+def test_load_missing_archive(tmp_path):
+    assert len(FFFArchive.load(tmp_path / "archive.json")) == 0
+
+
+class FakeContent:
+    def __init__(self, body, size):
+        self.chunks = [body[i : i + size] for i in range(0, len(body), size)]
+
+    async def iter_chunked(self, size):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def read_new_posts(body, chunk_size, archive=None):
+    cog = types.SimpleNamespace(archive=archive or FFFArchive())
+    resp = types.SimpleNamespace(content=FakeContent(body, chunk_size))
+    return asyncio.run(FactorioCogFriday._read_new_posts(cog, resp))
+
+
+FEED = (
+    b"<feed><title>Factorio</title><entry><title>Header lookalike</title>"
+    + entry(3, "Friday Facts #3")
+    + entry(99, "Blog post", kind="news")
+    + entry(2, "Friday Facts #2")
+    + entry(1, "Friday Facts #1")
+    + b"</feed>"
+)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, len(FEED)])
+def test_read_new_posts_across_chunks(chunk_size):
+    posts = read_new_posts(FEED, chunk_size)
+    assert [(post.number, post.title) for post in posts] == [
+        (3, "Friday Facts #3"),
+        (2, "Friday Facts #2"),
+        (1, "Friday Facts #1"),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [5, len(FEED)])
+def test_read_new_posts_stops_at_archived_post(chunk_size):
+    archive = FFFArchive([FFFPost(2, "Friday Facts #2", "")])
+    assert [post.number for post in read_new_posts(FEED, chunk_size, archive)] == [3]
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from broadcastboxlive import backoff as bbl_backoff
+from factoriocogfriday import backoff as fcf_backoff
+
+
+@pytest.fixture(params=[bbl_backoff, fcf_backoff], ids=["broadcastboxlive", "factoriocogfriday"])
+def backoff(request):
+    return request.param
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [(None, None), ("", None), ("120", 120.0), ("-5", 0.0), ("inf", None), ("nan", None)],
+)
+def test_parse_retry_after_seconds(backoff, value, expected):
+    assert backoff.parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_date(backoff):
+    assert backoff.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert backoff.parse_retry_after("not a date") is None
+
+
+def test_failures_back_off_until_the_circuit_opens(backoff):
+    controller = backoff.PollController(base_delay=60, failure_threshold=3, open_delay=900)
+    assert controller.allowed()
+
+    assert controller.last_ok is None
+    controller.record_failure()
+    assert controller.last_ok is False
+    assert not controller.allowed()
+    assert 30 <= controller.retry_in() <= 60
+    controller.record_failure()
+    assert not controller.is_open
+    controller.record_failure()
+    assert controller.is_open
+    assert controller.retry_in() >= 899
+
+
+def test_success_halves_the_failure_count(backoff):
+    controller = backoff.PollController()
+    for _ in range(3):
+        controller.record_failure()
+    controller.record_success()
+    assert controller.failures == 1
+    assert controller.last_ok
+    controller.record_success()
+    assert controller.failures == 0
+    assert controller.allowed()
+
+
+def test_retry_after_is_honoured(backoff):
+    controller = backoff.PollController(base_delay=1)
+    controller.record_failure(retry_after=120)
+    assert 119 <= controller.retry_in() <= 120
+
+
+@pytest.mark.parametrize("retry_after", [float("inf"), 99999999])
+def test_retry_after_is_capped(backoff, retry_after):
+    controller = backoff.PollController(max_delay=3600, open_delay=900)
+    controller.record_failure(retry_after=retry_after)
+    assert controller.retry_in() <= 3600
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import time
+import asyncio
+
+import pytest
+
+from broadcastboxlive import coordination as bbl_coordination
+from factoriocogfriday import coordination as fcf_coordination
+
+
+@pytest.fixture(
+    params=[bbl_coordination, fcf_coordination], ids=["broadcastboxlive", "factoriocogfriday"]
+)
+def caches(request, tmp_path):
+    """Two processes sharing one file."""
+    path = tmp_path / "coordination.sqlite3"
+    first, second = request.param.SharedCache(path), request.param.SharedCache(path)
+    asyncio.run(first.setup())
+    return first, second
+
+
+def test_lease_is_held_by_one_process(caches):
+    first, second = caches
+
+    async def run():
+        return [
+            await first.acquire("feed", 60),
+            await second.acquire("feed", 60),
+            await first.acquire("feed", 60),
+            await second.acquire("other", 60),
+        ]
+
+    assert asyncio.run(run()) == [True, False, True, True]
+
+
+def test_expired_lease_is_taken_over(caches):
+    first, second = caches
+
+    async def run():
+        await first.acquire("feed", 0.05)
+        await asyncio.sleep(0.1)
+        return await second.acquire("feed", 60), await first.acquire("feed", 60)
+
+    assert asyncio.run(run()) == (True, False)
+
+
+def test_released_lease_is_taken_over(caches):
+    first, second = caches
+
+    async def run():
+        await first.acquire("feed", 60)
+        await first.release_all()
+        return await second.acquire("feed", 60)
+
+    assert asyncio.run(run()) is True
+
+
+def test_published_values_are_shared(caches):
+    first, second = caches
+
+    async def run():
+        missing = await second.read("feed")
+        await first.publish("feed", {"latest_fff": 400})
+        return missing, await second.read("feed")
+
+    started = time.time()
+    missing, (value, updated) = asyncio.run(run())
+    assert missing is None
+    assert value == {"latest_fff": 400}
+    assert started <= updated <= time.time()
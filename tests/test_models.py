@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from broadcastboxlive.models import (
+    PAGE_FIELDS,
+    AggregateStatus,
+    LiveStream,
+    ServerStatus,
+    Stream,
+    paginate_streams,
+    parse_streams,
+)
+
+
+def live(key, **fields):
+    return dict({"streamKey": key, "videoStreams": [{}], "whepSessions": []}, **fields)
+
+
+def test_parse_streams_skips_idle_streams():
+    streams = parse_streams(
+        [live("Bearer a", firstSeenEpoch=100), {"streamKey": "idle", "audioPacketsReceived": 0}]
+    )
+    assert streams == {"Bearer a": Stream("Bearer a", 0, 100)}
+
+
+def test_parse_streams_keeps_first_seen_of_known_streams():
+    previous = {"a": Stream("a", 0, 100)}
+    assert parse_streams([live("a", firstSeenEpoch=None)], previous)["a"].first_seen == 100
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"streamKey": "a"},
+        "a",
+        None,
+        [None],
+        [{"videoStreams": [{}]}],
+        [live(42)],
+        [live("a", firstSeenEpoch="yesterday")],
+        [live("a", firstSeenEpoch=True)],
+        [live("a", whepSessions=3)],
+    ],
+)
+def test_parse_streams_rejects_malformed_payloads(payload):
+    with pytest.raises(ValueError):
+        parse_streams(payload)
+
+
+def on(server, *streams):
+    return [LiveStream(server, f"https://{server}/api/status", stream) for stream in streams]
+
+
+def test_paginate_streams_always_has_a_page():
+    assert paginate_streams([]) == [[]]
+
+
+def test_paginate_streams_orders_by_first_seen():
+    streams = on("b", Stream("late", 0, 200)) + on(
+        "a", Stream("early", 0, 100), Stream("x", 0, 200)
+    )
+    pages = paginate_streams(streams)
+    assert [(live.server, live.stream.key) for live in pages[0]] == [
+        ("a", "early"),
+        ("a", "x"),
+        ("b", "late"),
+    ]
+
+
+def test_paginate_streams_splits_full_pages():
+    streams = on("a", *(Stream(f"key{i}", 0, i) for i in range(PAGE_FIELDS + 1)))
+    pages = paginate_streams(streams)
+    assert [len(page) for page in pages] == [PAGE_FIELDS, 1]
+    assert pages[1][0].stream.key == f"key{PAGE_FIELDS}"
+
+
+def test_paginate_streams_splits_long_pages():
+    streams = on("a", *(Stream("k" * 1000 + str(i), 0, i) for i in range(5)))
+    pages = paginate_streams(streams)
+    assert len(pages) > 1
+    assert sum(len(page) for page in pages) == 5
+
+
+def aggregate(*streams, resp_status=200):
+    url = "https://a/api/status"
+    status = ServerStatus(url, {stream.key: stream for stream in streams}, resp_status, 0)
+    return AggregateStatus((("a", url),), (status,), (False,))
+
+
+def test_page_digests_ignore_clocks():
+    assert (
+        aggregate(Stream("a", 1, 100)).page_digests == aggregate(Stream("a", 1, 50)).page_digests
+    )
+
+
+def test_page_digests_follow_what_pages_show():
+    digests = aggregate(Stream("a", 1, 100)).page_digests
+    assert len(digests) == 1
+    assert aggregate(Stream("a", 2, 100)).page_digests != digests
+    assert aggregate(Stream("a", 1, 100), resp_status=500).page_digests != digests
+
+
+def test_page_digests_only_change_for_changed_pages():
+    streams = [Stream(f"key{i}", 0, i) for i in range(PAGE_FIELDS * 2)]
+    digests = aggregate(*streams).page_digests
+    new_stream = Stream("new", 0, PAGE_FIELDS * 2)
+    changed = aggregate(*streams[:-1], new_stream).page_digests
+    assert changed[0] == digests[0]
+    assert changed[1] != digests[1]
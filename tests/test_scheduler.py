@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import time
+import asyncio
+
+import pytest
+
+from broadcastboxlive import scheduler as bbl_scheduler
+from factoriocogfriday import scheduler as fcf_scheduler
+
+
+@pytest.fixture(
+    params=[bbl_scheduler, fcf_scheduler], ids=["broadcastboxlive", "factoriocogfriday"]
+)
+def scheduler(request):
+    return request.param.GuildScheduler()
+
+
+def test_pop_due_returns_only_due_guilds(scheduler):
+    scheduler.schedule(1, 0)
+    scheduler.schedule(2, 60)
+    assert scheduler.pop_due() == [1]
+    assert 1 not in scheduler
+    assert 2 in scheduler
+    assert scheduler.pop_due() == []
+
+
+def test_reschedule_replaces_previous_turn(scheduler):
+    scheduler.schedule(1, 0)
+    scheduler.schedule(1, 60)
+    assert scheduler.pop_due() == []
+    scheduler.schedule(1, 0)
+    assert scheduler.pop_due() == [1]
+    assert len(scheduler) == 0
+
+
+def test_removed_guild_is_never_due(scheduler):
+    scheduler.schedule(1, 0)
+    scheduler.remove(1)
+    assert scheduler.pop_due() == []
+    assert len(scheduler) == 0
+
+
+def test_jitter_stays_within_interval(scheduler):
+    started = time.monotonic()
+    for guild_id in range(100):
+        scheduler.schedule(guild_id, 60, jitter=True)
+    due = scheduler._due.values()
+    assert all(started <= when <= time.monotonic() + 60 for when in due)
+    assert len(set(due)) > 1
+
+
+def test_wait_due_wakes_up_for_new_guilds(scheduler):
+    async def run():
+        waiter = asyncio.ensure_future(scheduler.wait_due())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        scheduler.schedule(1, 0)
+        return await asyncio.wait_for(waiter, 1)
+
+    assert asyncio.run(run()) == [1]